@@ -1,23 +1,44 @@
 # app.py - Main Flask Application
 from flask import Flask, render_template 
 from routes import register_blueprints
+import database
+from utils import cleanup, static_assets
 from dotenv import load_dotenv
 load_dotenv()
 
 app = Flask(__name__)
 
-from config import SECRET_KEY
+from config import SECRET_KEY, CIRCUIT_BREAKER_CONFIG, PROFILE_IMAGE_CONFIG
 app.secret_key = SECRET_KEY
 
+# Request bodies over the image upload limit (plus room for the other form
+# fields) are refused while they stream in, before reaching any view
+app.config['MAX_CONTENT_LENGTH'] = (PROFILE_IMAGE_CONFIG['max_upload_mb'] + 1) * 1024 * 1024
+
 # Register all blueprints
 register_blueprints(app)
 
+# Per-request query timing (Server-Timing header + slow query log)
+database.init_app(app)
+
+# Background purge of expired OTP / email log / pending registration rows
+cleanup.init_app(app)
+
+# Content-hashed static URLs, far-future caching and gzip/brotli variants
+static_assets.init_app(app)
+
 # ============ ERROR HANDLERS ============
 
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
+@app.errorhandler(database.DatabaseUnavailable)
+def database_unavailable(e):
+    response = app.make_response((render_template('503.html'), 503))
+    response.headers['Retry-After'] = str(CIRCUIT_BREAKER_CONFIG['reset_timeout'])
+    return response
+
 # ============ RUN APP ============
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+# bench_prepared.py - Per-call latency of hot lookups, text protocol vs prepared statements
+# Usage: python benchmarks/bench_prepared.py [iterations]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import database
+
+QUERIES = [
+    ('get_user_by_id', "SELECT * FROM users WHERE id = %s", (1,)),
+    ('get_user_by_username', "SELECT * FROM users WHERE username = %s", ('admin',)),
+    ('get_user_by_email', "SELECT * FROM users WHERE email = %s", ('admin@example.com',)),
+    ('get_game_by_name', "SELECT * FROM games WHERE name = %s", ('tic_tac_toe',)),
+]
+
+def time_calls(query, params, prepared, iterations):
+    """Return per-call latencies in microseconds"""
+    # Warm up the pool (and the statement cache when prepared)
+    for _ in range(10):
+        database.execute_one(query, params, prepared=prepared)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        database.execute_one(query, params, prepared=prepared)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    samples.sort()
+    return samples
+
+def summary(samples):
+    return (sum(samples) / len(samples), samples[len(samples) // 2],
+            samples[int(len(samples) * 0.95)])
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{iterations} calls per query (times in microseconds)\n")
+    print(f"{'query':<22} {'mode':<9} {'mean':>8} {'p50':>8} {'p95':>8}")
+    for name, query, params in QUERIES:
+        for prepared in (False, True):
+            mean, p50, p95 = summary(time_calls(query, params, prepared, iterations))
+            mode = 'prepared' if prepared else 'text'
+            print(f"{name:<22} {mode:<9} {mean:>8.1f} {p50:>8.1f} {p95:>8.1f}")
+    print(f"\nstatement cache: {database.get_statement_stats()}")
+
+if __name__ == '__main__':
+    main()
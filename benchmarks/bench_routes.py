@@ -0,0 +1,64 @@
+# bench_routes.py - Throughput of every page on the embedded SQLite backend (no services needed)
+# Usage: python benchmarks/bench_routes.py [requests_per_route] [sqlite_path]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before config.py is imported
+os.environ['db_backend'] = 'sqlite'
+if len(sys.argv) > 2:
+    os.environ['sqlite_path'] = sys.argv[2]
+
+from app import app
+import database
+
+PUBLIC_ROUTES = ['/', '/login', '/register']
+USER_ROUTES = ['/dashboard', '/profile', '/edit_profile', '/games']
+ADMIN_ROUTES = ['/admin/dashboard', '/admin/users', '/admin/content',
+                '/admin/game-config', '/admin/edit-user/2', '/admin/add-user']
+
+def login(client, username, password):
+    response = client.post('/login', data={'username': username, 'password': password})
+    assert response.status_code == 302, f"login failed for {username}"
+
+def db_queries(response):
+    """Query count from the Server-Timing header (0 if the page hit no database)"""
+    header = response.headers.get('Server-Timing', '')
+    if 'desc="' not in header:
+        return 0
+    return int(header.split('desc="')[1].split()[0])
+
+def bench(client, path, iterations):
+    response = client.get(path)
+    assert response.status_code == 200, f"{path} returned {response.status_code}"
+    queries = db_queries(response)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.get(path)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, elapsed / iterations * 1000, queries
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"backend={database.get_backend().name}, {iterations} requests per route\n")
+    print(f"{'route':<22} {'req/s':>9} {'ms/req':>8} {'queries':>8}")
+
+    runs = [
+        (None, PUBLIC_ROUTES),
+        (('testuser', 'user123'), USER_ROUTES),
+        (('admin', 'admin123'), ADMIN_ROUTES),
+    ]
+    for account, routes in runs:
+        client = app.test_client()
+        if account:
+            login(client, *account)
+        for path in routes:
+            rps, ms, queries = bench(client, path, iterations)
+            print(f"{path:<22} {rps:>9.0f} {ms:>8.2f} {queries:>8}")
+
+    print(f"\npool: {database.get_pool_stats()}")
+
+if __name__ == '__main__':
+    main()
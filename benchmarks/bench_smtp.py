@@ -0,0 +1,107 @@
+# bench_smtp.py - OTP email throughput: new connection per message vs pooled vs batched
+# Usage: python benchmarks/bench_smtp.py [messages] [round_trip_ms]
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.email_helper import build_otp_email
+from utils.smtp_pool import SMTPPool
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server: accepts every message and throws it away.
+
+    Every reply is delayed by `round_trip` seconds to stand in for the
+    network distance to a real mail server.
+    """
+
+    round_trip = 0.0
+
+    def reply(self, line):
+        time.sleep(self.round_trip)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply("250 localhost")
+            elif command.startswith('DATA'):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1
+                self.reply("250 OK queued")
+            elif command.startswith('QUIT'):
+                self.reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    messages = 0
+
+
+def send_fresh(port, messages):
+    """The old behaviour: connect, send and quit for every message"""
+    for message in messages:
+        server = smtplib.SMTP('127.0.0.1', port)
+        server.send_message(message)
+        server.quit()
+
+def send_pooled(pool, messages):
+    for message in messages:
+        pool.send(message)
+
+def send_batched(pool, messages, batch_size=20):
+    for start in range(0, len(messages), batch_size):
+        pool.send_many(messages[start:start + batch_size])
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    round_trip_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    StandInSMTPHandler.round_trip = round_trip_ms / 1000
+
+    server = StandInSMTPServer(('127.0.0.1', 0), StandInSMTPHandler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    messages = [build_otp_email(f"user{i}@example.com", '123456') for i in range(count)]
+    for message in messages:
+        message.replace_header('From', 'noreply@example.com')
+    pool = SMTPPool('127.0.0.1', port, starttls=False, size=1)
+
+    print(f"{count} messages, {round_trip_ms} ms per SMTP round trip (no TLS/AUTH)\n")
+    print(f"{'mode':<28}{'msg/s':>10}{'ms/msg':>10}{'connects':>10}")
+    runs = [
+        ('new connection per message', lambda: send_fresh(port, messages), None),
+        ('pooled connection', lambda: send_pooled(pool, messages), pool),
+        ('pooled, batches of 20', lambda: send_batched(pool, messages), pool),
+    ]
+    for name, run, run_pool in runs:
+        connects_before = run_pool.connects if run_pool else 0
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        connects = (run_pool.connects - connects_before) if run_pool else count
+        print(f"{name:<28}{count / elapsed:>10.0f}{elapsed / count * 1000:>10.2f}{connects:>10}")
+
+    pool.close()
+    server.shutdown()
+    print(f"\nserver accepted {server.messages} messages")
+    print("With STARTTLS and AUTH on a real server the per-connection cost is several "
+          "round trips higher, so pooling saves more.")
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,87 @@ DB_CONFIG = {
     'database': 'flask_blog_db'
 }
 
+# 'mysql' (default) or 'sqlite' - embedded stand-in for local runs and benchmarks
+DB_BACKEND = os.getenv('db_backend', 'mysql')
+
+SQLITE_CONFIG = {
+    'path': os.getenv('sqlite_path', ':memory:'),  # file path or ':memory:'
+    'init_schema': True,   # create tables + default rows from init_db_scheme.py
+    'busy_timeout': 5
+}
+
+# Connection pool settings (per worker process)
+DB_POOL_CONFIG = {
+    'pool_size': int(os.getenv('db_pool_size', 5)),            # connections kept open
+    'max_overflow': int(os.getenv('db_pool_max_overflow', 10)),  # extra connections allowed under load
+    'pool_timeout': 30,     # seconds to wait for a free connection
+    'pool_recycle': 1800,   # close connections idle longer than this (seconds)
+    'pre_ping': True        # ping idle connections before handing them out
+}
+
+# Timeouts (seconds) so a slow or dead server cannot tie up workers
+DB_TIMEOUT_CONFIG = {
+    'connect_timeout': int(os.getenv('db_connect_timeout', 3)),
+    'read_timeout': int(os.getenv('db_read_timeout', 10)),
+    'write_timeout': int(os.getenv('db_write_timeout', 10))
+}
+
+# Fail fast after repeated connection failures, then probe for recovery
+CIRCUIT_BREAKER_CONFIG = {
+    'failure_threshold': 5,    # consecutive failures before the circuit opens
+    'reset_timeout': 30,       # seconds to stay open before letting a probe through
+    'half_open_max_calls': 1   # concurrent probes while half open
+}
+
+# Bounded retries for transient errors (lost connection, deadlock, lock wait)
+DB_RETRY_CONFIG = {
+    'max_retries': 2,
+    'backoff_base': 0.05,   # seconds, doubled per attempt (with jitter)
+    'backoff_max': 1.0
+}
+
+# Read replicas for SELECTs (comma-separated hosts, same credentials as DB_CONFIG)
+DB_REPLICAS = [dict(DB_CONFIG, host=host.strip())
+               for host in os.getenv('db_replicas', '').split(',') if host.strip()]
+
+REPLICA_CONFIG = {
+    'max_lag_seconds': 5,      # skip replicas further behind than this
+    'lag_check_interval': 10,  # seconds between lag checks per replica
+    'sticky_seconds': 5        # after a write, read from the primary for this long
+}
+
+# Prepared statements kept per pooled connection
+DB_STATEMENT_CACHE_SIZE = 32
+
+# Query instrumentation / slow query log
+QUERY_LOG_CONFIG = {
+    'slow_query_ms': float(os.getenv('slow_query_ms', 100)),  # log queries slower than this
+    'very_slow_query_ms': 1000,     # ...at ERROR level above this
+    'max_queries_per_request': 10,  # log requests doing this many round trips
+    'log_file': os.getenv('slow_query_log')  # None = propagate to the root logger
+}
+
+# Seconds the homepage content / admin profile row stay cached per worker
+# (saving /admin/content or the profile image clears the cache immediately)
+SITE_CACHE_TTL = 300
+
+# Seconds the game catalog stays cached per worker (toggling a game clears it)
+GAME_CACHE_TTL = 300
+
+# Per-worker cache of user rows looked up by id/username/email (user writes
+# clear the entry at once; other workers see them after at most the TTL)
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 1024
+
+# Rendered pages served to logged-out visitors, per worker (keyed on the page's
+# content version; saving /admin/content or the profile image clears them)
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_SIZE = 32
+
+# Admin user lists (keyset pagination)
+USERS_PAGE_SIZE = 20
+USERS_MAX_PAGE_SIZE = 100
+
 # Email settings 
 EMAIL_CONFIG = {
     'smtp_server': 'smtp.gmail.com',
@@ -17,6 +98,65 @@ EMAIL_CONFIG = {
     'password': os.getenv('mail_password')
 }
 
+# Reused SMTP connections (see utils/smtp_pool.py)
+SMTP_POOL_CONFIG = {
+    'size': 2,               # idle logged-in connections kept per worker process
+    'max_messages': 100,     # messages per connection before it is recycled
+    'noop_interval': 10,     # NOOP-check connections idle longer than this (seconds)
+    'max_idle': 240,         # drop connections idle longer than this (seconds)
+    'timeout': 10
+}
+
 OTP_EXPIRY_MINUTES = 5
 
+# Flask's instance folder for app.py (Flask(__name__) here): private runtime files
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+# Store for short-lived data (OTPs, rate limit windows): 'sqlite' (a file shared
+# by all workers on this host, readable by the app's user only), 'redis' (shared across hosts; needs
+# `pip install redis`) or 'memory' (per worker process: single-worker runs only)
+KV_STORE_CONFIG = {
+    'backend': os.getenv('kv_backend', 'sqlite'),
+    'path': os.getenv('kv_path', os.path.join(INSTANCE_DIR, 'kv_store.sqlite3')),
+    'redis_url': os.getenv('redis_url', 'redis://localhost:6379/0'),
+    'prefix': 'flask_app:'
+}
+
+# Sliding-window rate limits: at most `limit` events per `window` seconds
+RATE_LIMITS = {
+    'otp_email': {'limit': 3, 'window': 3600}  # OTP emails per address
+}
+
+# Background purge of expired OTPs, email log entries and abandoned registrations
+PURGE_CONFIG = {
+    'enabled': os.getenv('purge_enabled', '1') == '1',
+    'interval': int(os.getenv('purge_interval', 600)),  # seconds between runs
+    'batch_size': 500,    # rows deleted per transaction (keeps locks short)
+    'max_batches': 100,   # per table and run; the rest waits for the next run
+    'batch_pause': 0.05,  # seconds between batches
+    'retention_minutes': {
+        'otp_codes': OTP_EXPIRY_MINUTES,
+        'email_log': 60,  # the spam check counts the last hour
+        'pending_registrations': 24 * 60,
+    }
+}
+
+# Background email delivery (requests queue the message and return at once)
+OUTBOX_CONFIG = {
+    'workers': 2,          # delivery threads per worker process
+    'max_queue': 1000,     # messages waiting; further ones are dropped
+    'max_attempts': 4,     # tries per message before giving up
+    'backoff_base': 2.0,   # retry after 2, 4, 8... seconds
+    'backoff_max': 60.0
+}
+
 Image_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+# Profile image uploads: resized in the background into width variants
+# (WebP plus a PNG fallback) when Pillow is installed
+PROFILE_IMAGE_CONFIG = {
+    'max_upload_mb': 8,           # larger uploads are rejected while streaming
+    'max_pixels': 40000000,       # refuse decompression bombs
+    'widths': [200, 350, 700],    # shown at 350px (200px on phones), 700 for 2x screens
+    'webp_quality': 80
+}
@@ -1,57 +1,797 @@
 # database.py - Database Connection Helper
-import mysql.connector
-from config import DB_CONFIG
+import logging
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import g, has_request_context, request, session
+from config import (DB_BACKEND, DB_POOL_CONFIG, DB_STATEMENT_CACHE_SIZE, QUERY_LOG_CONFIG,
+                    DB_REPLICAS, REPLICA_CONFIG, CIRCUIT_BREAKER_CONFIG, DB_RETRY_CONFIG)
+from db_backends import create_backend
+
+class DatabaseError(Exception):
+    """Raised by transaction() when a statement or the commit fails"""
+
+class DatabaseUnavailable(Exception):
+    """Raised when no connection can be had: database down, circuit open or pool exhausted.
+
+    Not a DatabaseError on purpose - model functions swallow those, while
+    this one propagates to the 503 error handler in app.py.
+    """
+
+class PoolTimeout(DatabaseUnavailable):
+    """Raised when no connection becomes free within pool_timeout"""
+
+# ============ CIRCUIT BREAKER ============
+
+class CircuitBreaker:
+    """Fail fast while a database server is down.
+
+    closed    - normal operation; `failure_threshold` consecutive failures open it
+    open      - every checkout fails immediately for `reset_timeout` seconds
+    half_open - lets `half_open_max_calls` probes through; a success closes
+                the breaker again, a failure re-opens it
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._times_opened = 0
+        self._rejected = 0
+
+    def allow(self):
+        """Return True if a call may go to the server right now"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self._rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def release_probe(self):
+        """Give back a half-open probe slot taken by allow() that ended without a verdict"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                print(f"Database circuit '{self.name}' closed")
+                self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                print(f"Database circuit '{self.name}' opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._times_opened += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'state_value': self.STATE_VALUES[self.state],
+                'consecutive_failures': self._failures,
+                'times_opened': self._times_opened,
+                'rejected_calls': self._rejected,
+            }
+
+def _backoff(attempt):
+    """Exponential backoff with jitter for retry number `attempt` (0-based)"""
+    delay = min(DB_RETRY_CONFIG['backoff_max'], DB_RETRY_CONFIG['backoff_base'] * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+# ============ CONNECTION POOL ============
+
+class ConnectionPool:
+    """Thread-safe pool of database connections.
+
+    Keeps up to `pool_size` idle connections open and allows `max_overflow`
+    extra connections under load (closed again when returned). Idle
+    connections older than `pool_recycle` seconds are replaced, and with
+    `pre_ping` every reused connection is pinged before it is handed out.
+    New connections are retried with backoff, and an optional CircuitBreaker
+    makes checkouts fail fast (DatabaseUnavailable) while the server is down.
+    """
+
+    def __init__(self, connect, ping, pool_size=5, max_overflow=10, pool_timeout=30,
+                 pool_recycle=1800, pre_ping=True, breaker=None, connect_retries=0):
+        self._connect = connect
+        self._ping = ping
+        self.breaker = breaker
+        self.connect_retries = connect_retries
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()  # (conn, returned_at)
+        self._cond = threading.Condition()
+        self._opened = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._checkout_time = 0.0
+        self._checkout_max = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._invalidated = 0
+
+    def acquire(self):
+        """Check out a connection, opening a new one if allowed"""
+        if self.breaker is not None and not self.breaker.allow():
+            raise DatabaseUnavailable(f"Circuit '{self.breaker.name}' is open")
+        try:
+            return self._checkout()
+        except BaseException:
+            # e.g. PoolTimeout: no verdict on the server, so a half-open
+            # breaker must not keep the probe slot (it would never recover)
+            if self.breaker is not None:
+                self.breaker.release_probe()
+            raise
+
+    def _checkout(self):
+        start = time.perf_counter()
+        deadline = start + self.pool_timeout
+        conn = None
+        returned_at = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO keeps a small set of connections hot
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._opened < self.pool_size + self.max_overflow:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No free connection after {self.pool_timeout}s "
+                        f"({self._in_use} in use)")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._is_usable(conn, returned_at):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._open_connection()
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time += elapsed
+            self._checkout_max = max(self._checkout_max, elapsed)
+        return conn
+
+    def _open_connection(self):
+        """Connect, retrying with backoff; gives up early once the breaker opens"""
+        attempt = 0
+        while True:
+            try:
+                return self._connect()
+            except Exception as err:
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                    circuit_open = self.breaker.state == CircuitBreaker.OPEN
+                else:
+                    circuit_open = False
+                if attempt >= self.connect_retries or circuit_open:
+                    raise DatabaseUnavailable(f"Cannot connect: {err}") from err
+                time.sleep(_backoff(attempt))
+                attempt += 1
+
+    def release(self, conn, discard=False):
+        """Return a connection; discard it if it is broken or over pool_size"""
+        if not discard:
+            try:
+                # Never hand a half-finished transaction to the next caller
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.pool_size:
+                self._opened -= 1
+                if discard:
+                    self._invalidated += 1
+                keep = False
+            else:
+                self._idle.append((conn, time.monotonic()))
+                keep = True
+            self._cond.notify()
+
+        if not keep:
+            self._close(conn)
+
+    def _is_usable(self, conn, returned_at):
+        if self.pool_recycle and time.monotonic() - returned_at > self.pool_recycle:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                self._ping(conn)
+            except Exception:
+                with self._cond:
+                    self._invalidated += 1
+                return False
+        return True
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """Close all idle connections"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Snapshot of pool usage for sizing and monitoring"""
+        breaker = self.breaker.stats() if self.breaker is not None else None
+        with self._cond:
+            return {
+                'breaker': breaker,
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'checkout_avg_ms': round(self._checkout_time / self._checkouts * 1000, 3)
+                                   if self._checkouts else 0.0,
+                'checkout_max_ms': round(self._checkout_max * 1000, 3),
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'invalidated': self._invalidated,
+            }
+
+
+# ============ BACKEND ============
+
+_backend = None
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_backend():
+    """Return the active database backend (DB_BACKEND in config.py)"""
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                _backend = create_backend(DB_BACKEND)
+    return _backend
+
+def use_backend(backend):
+    """Switch to another backend instance (e.g. SQLiteBackend for benchmarks)"""
+    global _backend, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.dispose()
+        _backend = backend
+        _pool = None
+
+def _create_pool(backend, name):
+    breaker = CircuitBreaker(name, **CIRCUIT_BREAKER_CONFIG)
+    return ConnectionPool(backend.connect, backend.ping, breaker=breaker,
+                          connect_retries=DB_RETRY_CONFIG['max_retries'], **DB_POOL_CONFIG)
+
+def get_pool():
+    """Return the process-wide connection pool (rebuilt after a fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        backend = get_backend()
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = _create_pool(backend, 'primary')
+                _pool_pid = os.getpid()
+    return _pool
+
+def get_pool_stats():
+    """Get connection pool statistics"""
+    return get_pool().stats()
+
+# ============ READ REPLICAS ============
+
+class ReplicaSet:
+    """Round-robin over read replica pools, skipping replicas that are down or lagging.
+
+    Replication lag is re-checked at most every `lag_check_interval` seconds
+    per replica; a replica more than `max_lag_seconds` behind (or whose lag
+    cannot be read) is skipped until its next check.
+    """
+
+    def __init__(self, backends, max_lag_seconds=5, lag_check_interval=10):
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_interval = lag_check_interval
+        self.replicas = [{
+            'name': backend.config['host'],
+            'backend': backend,
+            'pool': _create_pool(backend, f"replica:{backend.config['host']}"),
+            'lag': None,
+            'healthy': True,
+            'checked_at': None,
+            'checking': False,
+            'reads': 0,
+        } for backend in backends]
+        self._next = 0
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def acquire(self):
+        """Check out a connection from the next usable replica, or (None, None)"""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+            if not self._is_usable(replica):
+                continue
+            try:
+                conn = replica['pool'].acquire()
+            except (replica['backend'].Error, DatabaseUnavailable) as err:
+                print(f"Replica Error ({replica['name']}): {err}")
+                replica['healthy'] = False
+                continue
+            replica['reads'] += 1
+            return replica['pool'], conn
+        with self._lock:
+            self.fallbacks += 1
+        return None, None
+
+    def _is_usable(self, replica):
+        now = time.monotonic()
+        with self._lock:
+            due = (replica['checked_at'] is None
+                   or now - replica['checked_at'] >= self.lag_check_interval)
+            if due and not replica['checking']:
+                replica['checking'] = True
+            else:
+                due = False
+        if due:
+            self._check_lag(replica)
+        return replica['healthy']
+
+    def _check_lag(self, replica):
+        pool, backend = replica['pool'], replica['backend']
+        lag = None
+        try:
+            conn = pool.acquire()
+            discard = False
+            try:
+                lag = backend.replica_lag(conn)
+            except backend.Error:
+                discard = True
+            finally:
+                pool.release(conn, discard)
+        except (backend.Error, DatabaseUnavailable) as err:
+            print(f"Replica Error ({replica['name']}): {err}")
+        with self._lock:
+            replica['lag'] = lag
+            replica['healthy'] = lag is not None and lag <= self.max_lag_seconds
+            replica['checked_at'] = time.monotonic()
+            replica['checking'] = False
+
+    def stats(self):
+        return {
+            'fallbacks_to_primary': self.fallbacks,
+            'replicas': [{
+                'name': r['name'],
+                'healthy': r['healthy'],
+                'lag_seconds': r['lag'],
+                'reads': r['reads'],
+                'pool': r['pool'].stats(),
+            } for r in self.replicas],
+        }
+
+
+_replicas = None
+_replicas_pid = None
+
+def get_replica_set():
+    """Return the replica set, or None when no replicas are configured"""
+    global _replicas, _replicas_pid
+    backend = get_backend()
+    if not DB_REPLICAS or not backend.supports_replicas:
+        return None
+    if _replicas is None or _replicas_pid != os.getpid():
+        with _pool_lock:
+            if _replicas is None or _replicas_pid != os.getpid():
+                backends = [create_backend(backend.name, config) for config in DB_REPLICAS]
+                _replicas = ReplicaSet(backends, REPLICA_CONFIG['max_lag_seconds'],
+                                       REPLICA_CONFIG['lag_check_interval'])
+                _replicas_pid = os.getpid()
+    return _replicas
+
+def get_replica_stats():
+    """Get replica routing statistics (None without replicas)"""
+    replicas = get_replica_set()
+    return replicas.stats() if replicas else None
+
+def _reads_pinned_to_primary():
+    """Read-your-writes: after a write, this request (and briefly this session) reads the primary"""
+    if not has_request_context():
+        return False
+    if g.get('db_wrote'):
+        return True
+    return session.get('db_primary_until', 0) > time.time()
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+
+# ============ QUERY HELPERS ============
 
 def get_db_connection():
-    """Create and return a database connection"""
+    """Check out a pooled database connection (give it back with release_connection)"""
     try:
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database']
-        )
-        return conn
-    except mysql.connector.Error as err:
+        return get_pool().acquire()
+    except DatabaseUnavailable as err:
         print(f"Database Error: {err}")
         return None
 
-def execute_query(query, params=None, fetch=False):
-    """Execute a query and optionally fetch results"""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(query, params or ())
-        if fetch:
-            result = cursor.fetchall()
+def release_connection(conn, discard=False):
+    """Return a connection to the pool"""
+    get_pool().release(conn, discard)
+
+def _is_connection_error(err):
+    return get_backend().is_connection_error(err)
+
+def _checkout(read, primary=False):
+    """Check out a connection for a read (replica when possible) or a write (primary).
+
+    primary=True keeps a read on the primary. Raises DatabaseUnavailable if
+    the primary cannot be reached.
+    """
+    if read and not primary and not _reads_pinned_to_primary():
+        replicas = get_replica_set()
+        if replicas is not None:
+            pool, conn = replicas.acquire()
+            if conn is not None:
+                return pool, conn
+    pool = get_pool()
+    return pool, pool.acquire()
+
+def _run(query, params, mode, prepared, primary=False):
+    """Run one statement with bounded retries; mode is 'all', 'one' or 'write'.
+
+    Transient errors (lost connection, deadlock, lock wait timeout) are
+    retried with backoff. Writes are only retried after a deadlock or lock
+    wait timeout, when the server has already rolled the statement back.
+    Other query errors are printed and return None, as before.
+    """
+    read = mode != 'write'
+    attempt = 0
+    while True:
+        pool, conn = _checkout(read, primary)
+        discard = False
+        cursor = None
+        start = time.perf_counter()
+        try:
+            if prepared:
+                cursor = get_statement_cache(conn).execute(query, params or ())
+            else:
+                cursor = _backend.cursor(conn)
+                cursor.execute(query, params or ())
+            if mode == 'all':
+                result = cursor.fetchall()
+                record_query(query, start, len(result))
+            elif mode == 'one':
+                result = cursor.fetchone()
+                # Drain remaining rows so the connection can be reused
+                cursor.fetchall()
+                record_query(query, start, 0 if result is None else 1)
+            else:
+                if conn.in_transaction:
+                    conn.commit()  # not needed on autocommit connections
+                _mark_write()
+                result = cursor.lastrowid
+                record_query(query, start, cursor.rowcount)
+            return result
+        except _backend.Error as err:
+            discard = _is_connection_error(err)
+            if discard and pool.breaker is not None:
+                pool.breaker.record_failure()
+            retryable = _backend.is_deadlock(err) or (read and _backend.is_transient_error(err))
+            if retryable and attempt < DB_RETRY_CONFIG['max_retries']:
+                print(f"Query Error (retrying): {err}")
+            else:
+                print(f"Query Error: {err}")
+                return None
+        finally:
+            if cursor is not None and not prepared:
+                try:
+                    cursor.close()
+                except _backend.Error:
+                    discard = True
+            pool.release(conn, discard)
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+def execute_query(query, params=None, fetch=False, prepared=False, primary=False):
+    """Execute a query and optionally fetch results.
+
+    With prepared=True the statement is prepared server-side once per
+    connection and reused from that connection's statement cache.
+    Fetches are routed to a read replica when DB_REPLICAS is configured,
+    unless primary=True: use that for reads that fill a shared cache, which
+    must not store rows from a lagging replica after a write cleared it.
+    """
+    return _run(query, params, 'all' if fetch else 'write', prepared, primary)
+
+def execute_one(query, params=None, prepared=False, primary=False):
+    """Execute query and fetch one result (see execute_query for prepared/replicas/primary)"""
+    return _run(query, params, 'one', prepared, primary)
+
+# ============ PREPARED STATEMENTS ============
+
+class StatementCache:
+    """LRU of server-side prepared statements for one connection, keyed by SQL text"""
+
+    def __init__(self, conn, max_size=32):
+        self.conn = conn
+        self.max_size = max_size
+        self._cursors = OrderedDict()  # query -> (query, cursor)
+
+    def execute(self, query, params=None):
+        """Execute `query` on its cached prepared cursor and return the cursor"""
+        entry = self._cursors.get(query)
+        if entry is None:
+            cursor = _backend.prepared_cursor(self.conn)
+            # The cursor skips re-preparing only when it sees the *same* string
+            # object again, so keep the first one and always execute with it
+            entry = (query, cursor)
+            self._cursors[query] = entry
+            if len(self._cursors) > self.max_size:
+                _, (_, old_cursor) = self._cursors.popitem(last=False)
+                try:
+                    old_cursor.close()
+                except _backend.Error:
+                    pass
+            _statement_stats['prepares'] += 1
         else:
-            conn.commit()
-            result = cursor.lastrowid
-        return result
-    except mysql.connector.Error as err:
-        print(f"Query Error: {err}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+            self._cursors.move_to_end(query)
+            _statement_stats['hits'] += 1
+        stored_query, cursor = entry
+        cursor.execute(stored_query, params or ())
+        return cursor
 
-def execute_one(query, params=None):
-    """Execute query and fetch one result"""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    
-    cursor = conn.cursor(dictionary=True)
+    def __len__(self):
+        return len(self._cursors)
+
+
+_statement_caches = weakref.WeakKeyDictionary()
+_statement_stats = {'prepares': 0, 'hits': 0}
+
+def get_statement_cache(conn):
+    """Get (or create) the prepared statement cache of a connection"""
+    cache = _statement_caches.get(conn)
+    if cache is None:
+        cache = StatementCache(conn, DB_STATEMENT_CACHE_SIZE)
+        _statement_caches[conn] = cache
+    return cache
+
+def get_statement_stats():
+    """Prepared statement cache counters (prepares = cache misses)"""
+    return dict(_statement_stats, cached=sum(len(c) for c in list(_statement_caches.values())))
+
+# ============ TRANSACTIONS ============
+
+class Transaction:
+    """Statement runner bound to the single connection of a transaction() block"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = _backend.cursor(conn)
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=None):
+        """Execute a statement and return its lastrowid (rowcount is kept on self)"""
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        self.rowcount = self.cursor.rowcount
+        self.lastrowid = self.cursor.lastrowid
+        record_query(query, start, self.rowcount)
+        return self.lastrowid
+
+    def executemany(self, query, seq_params):
+        """Execute a statement once per parameter tuple and return the affected row count"""
+        start = time.perf_counter()
+        self.cursor.executemany(query, seq_params)
+        self.rowcount = self.cursor.rowcount
+        self.lastrowid = self.cursor.lastrowid
+        record_query(query, start, self.rowcount)
+        return self.rowcount
+
+    def fetch_all(self, query, params=None):
+        """Execute a query and fetch all rows"""
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        rows = self.cursor.fetchall()
+        record_query(query, start, len(rows))
+        return rows
+
+    def fetch_one(self, query, params=None):
+        """Execute a query and fetch one row"""
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        row = self.cursor.fetchone()
+        self.cursor.fetchall()
+        record_query(query, start, 0 if row is None else 1)
+        return row
+
+    def close(self):
+        try:
+            self.cursor.close()
+        except _backend.Error:
+            pass
+
+@contextmanager
+def transaction():
+    """Run several statements on one connection with a single commit.
+
+    Usage:
+        with transaction() as tx:
+            tx.execute("DELETE ...", (email,))
+            tx.execute("INSERT ...", params)
+
+    Any error rolls the whole block back and is re-raised as DatabaseError.
+    DatabaseUnavailable propagates unchanged when no connection can be had.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    tx = Transaction(conn)
+    discard = False
     try:
-        cursor.execute(query, params or ())
-        result = cursor.fetchone()
-        return result
-    except mysql.connector.Error as err:
-        print(f"Query Error: {err}")
-        return None
+        _backend.begin(conn)
+        yield tx
+        conn.commit()
+        _mark_write()
+    except _backend.Error as err:
+        print(f"Transaction Error: {err}")
+        discard = _rollback(conn) or _is_connection_error(err)
+        if _is_connection_error(err) and pool.breaker is not None:
+            pool.breaker.record_failure()
+        raise DatabaseError(str(err)) from err
+    except BaseException:
+        discard = _rollback(conn)
+        raise
     finally:
-        cursor.close()
-        conn.close()
+        tx.close()
+        pool.release(conn, discard)
+
+def _rollback(conn):
+    """Roll back, returning True if the connection is no longer usable"""
+    try:
+        conn.rollback()
+        return False
+    except _backend.Error:
+        return True
+
+# ============ QUERY INSTRUMENTATION ============
+
+slow_query_log = logging.getLogger('slow_query')
+
+_FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^'\\]|\\.)*'"), '?'),   # string literals
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), '?'),     # numeric literals
+    (re.compile(r"%s"), '?'),                      # driver placeholders
+    (re.compile(r"\s+"), ' '),
+]
+
+@lru_cache(maxsize=512)
+def fingerprint(query):
+    """Normalize SQL text so the same statement with different values groups together"""
+    text = query
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+def record_query(query, start, rows):
+    """Record one executed statement for the current request and the slow query log"""
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if has_request_context():
+        stats = g.get('db_stats')
+        if stats is None:
+            stats = g.db_stats = {'count': 0, 'time_ms': 0.0, 'queries': []}
+        stats['count'] += 1
+        stats['time_ms'] += elapsed_ms
+        stats['queries'].append((fingerprint(query), round(elapsed_ms, 3), rows))
+
+    if elapsed_ms >= QUERY_LOG_CONFIG['slow_query_ms']:
+        level = (logging.ERROR if elapsed_ms >= QUERY_LOG_CONFIG['very_slow_query_ms']
+                 else logging.WARNING)
+        path = request.path if has_request_context() else '-'
+        slow_query_log.log(level, "%.1fms rows=%s path=%s query=%s",
+                           elapsed_ms, rows, path, fingerprint(query))
+
+def get_request_db_stats():
+    """Query count/time recorded so far in the current request"""
+    if has_request_context():
+        return g.get('db_stats') or {'count': 0, 'time_ms': 0.0, 'queries': []}
+    return None
+
+def init_app(app):
+    """Register per-request hooks (Server-Timing, read-your-writes) and the slow query log"""
+    if QUERY_LOG_CONFIG['log_file'] and not slow_query_log.handlers:
+        handler = logging.FileHandler(QUERY_LOG_CONFIG['log_file'])
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        slow_query_log.addHandler(handler)
+        slow_query_log.setLevel(logging.WARNING)
+
+    @app.after_request
+    def pin_reads_after_write(response):
+        # Keep the next requests of this session (e.g. the redirect after a
+        # POST) on the primary until replicas have caught up
+        if g.get('db_wrote') and get_replica_set() is not None:
+            session['db_primary_until'] = time.time() + REPLICA_CONFIG['sticky_seconds']
+        return response
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = get_request_db_stats()
+        if stats and stats['count']:
+            response.headers.add('Server-Timing',
+                                 f'db;dur={stats["time_ms"]:.2f};desc="{stats["count"]} queries"')
+            if stats['count'] >= QUERY_LOG_CONFIG['max_queries_per_request']:
+                slow_query_log.warning("%d queries (%.1fms) in %s %s: %s",
+                                       stats['count'], stats['time_ms'], request.method,
+                                       request.path, [q[0] for q in stats['queries']])
+        return response
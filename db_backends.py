@@ -0,0 +1,296 @@
+# db_backends.py - Database Backends (MySQL and an embedded SQLite stand-in)
+import re
+import sqlite3
+from functools import lru_cache
+from config import DB_CONFIG, SQLITE_CONFIG, DB_TIMEOUT_CONFIG
+
+# ============ MYSQL ============
+
+class MySQLBackend:
+    """Production backend using mysql-connector-python"""
+
+    name = 'mysql'
+    supports_replicas = True
+
+    # CR_SERVER_GONE_ERROR, CR_SERVER_LOST, ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK
+    TRANSIENT_ERRNOS = {2006, 2013, 1205, 1213}
+    DEADLOCK_ERRNOS = {1205, 1213}
+
+    def __init__(self, config=None):
+        import mysql.connector
+        self.driver = mysql.connector
+        self.config = config or DB_CONFIG
+        self.Error = mysql.connector.Error
+        self.IntegrityError = mysql.connector.IntegrityError
+
+    def connect(self):
+        return self.driver.connect(
+            host=self.config['host'],
+            user=self.config['user'],
+            password=self.config['password'],
+            database=self.config['database'],
+            # Plain statements commit themselves, so a pooled read needs no
+            # ROLLBACK on release; transactions still go through begin()
+            autocommit=True,
+            connection_timeout=DB_TIMEOUT_CONFIG['connect_timeout'],
+            read_timeout=DB_TIMEOUT_CONFIG['read_timeout'],
+            write_timeout=DB_TIMEOUT_CONFIG['write_timeout']
+        )
+
+    def cursor(self, conn):
+        return conn.cursor(dictionary=True)
+
+    def prepared_cursor(self, conn):
+        return conn.cursor(prepared=True, dictionary=True)
+
+    def begin(self, conn):
+        conn.start_transaction()
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+    def is_connection_error(self, err):
+        return isinstance(err, (self.driver.InterfaceError, self.driver.OperationalError))
+
+    def is_transient_error(self, err):
+        """Errors worth retrying for a read (lost connection, lock conflicts)"""
+        return getattr(err, 'errno', None) in self.TRANSIENT_ERRNOS
+
+    def is_deadlock(self, err):
+        """Errors after which the server has rolled the statement back (safe to retry)"""
+        return getattr(err, 'errno', None) in self.DEADLOCK_ERRNOS
+
+    def prepare_ddl(self, statement):
+        return statement
+
+    def index_exists(self, conn, table, name):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT 1 FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                LIMIT 1
+            """, (table, name))
+            return cursor.fetchall() != []
+        finally:
+            cursor.close()
+
+    def full_table_scans(self, conn, query, params=()):
+        """Tables that EXPLAIN says the query reads with a full scan (type ALL)"""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("EXPLAIN " + query, tuple(params))
+            plan = cursor.fetchall()
+        finally:
+            cursor.close()
+        return [row['table'] for row in plan if row.get('type') == 'ALL']
+
+    def replica_lag(self, conn):
+        """Seconds this replica is behind its source (None if replication is not running)"""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except self.driver.ProgrammingError:
+                cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+            status = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        if not status:
+            return None
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return None if lag is None else int(lag)
+
+# ============ SQLITE ============
+
+_SQL_TRANSLATIONS = [
+    # DATE_SUB(NOW(), INTERVAL 5 MINUTE) -> datetime('now', '-5 minutes')
+    (re.compile(r"DATE_SUB\(\s*NOW\(\)\s*,\s*INTERVAL\s+(\d+)\s+(\w+?)S?\s*\)", re.I),
+     lambda m: f"datetime('now', '-{m.group(1)} {m.group(2).lower()}s')"),
+    # DATE_SUB(NOW(), INTERVAL %s MINUTE) -> datetime('now', '-' || %s || ' minutes')
+    (re.compile(r"DATE_SUB\(\s*NOW\(\)\s*,\s*INTERVAL\s+%s\s+(\w+?)S?\s*\)", re.I),
+     lambda m: f"datetime('now', '-' || %s || ' {m.group(1).lower()}s')"),
+    (re.compile(r"\bNOW\(\)", re.I), "datetime('now')"),
+    (re.compile(r"\bCURDATE\(\)", re.I), "date('now')"),
+    (re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.I), ""),
+    (re.compile(r"%s"), "?"),
+]
+
+_DDL_TRANSLATIONS = [
+    (re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bENUM\([^)]*\)", re.I), "TEXT"),
+    (re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", re.I), ""),
+]
+
+# "SCAN users" is a full scan; "SCAN users USING INDEX ..." and "SEARCH ..." are not
+_FULL_SCAN_PLAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+@lru_cache(maxsize=512)
+def translate_sql(query):
+    """Rewrite the MySQL dialect used in models.py into SQLite"""
+    for pattern, replacement in _SQL_TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+def translate_ddl(statement):
+    """Rewrite a MySQL CREATE TABLE from init_db_scheme.py into SQLite"""
+    for pattern, replacement in _DDL_TRANSLATIONS:
+        statement = pattern.sub(replacement, statement)
+    return statement
+
+
+class SQLiteCursor:
+    """DB-API cursor wrapper that accepts MySQL-style queries and returns dict rows"""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate_sql(query), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate_sql(query), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """Plain sqlite3 connection that (unlike the C type) can be weak-referenced"""
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class SQLiteBackend:
+    """Embedded stand-in backend for local runs and benchmarks (no MySQL server).
+
+    The schema and default rows come from init_db_scheme.py. With the default
+    path ':memory:' all pooled connections share one in-memory database that
+    lives as long as the process.
+    """
+
+    name = 'sqlite'
+    supports_replicas = False
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, config=None):
+        self.config = config or SQLITE_CONFIG
+        path = self.config['path']
+        if path == ':memory:':
+            # Named shared-cache database so every pooled connection sees the same data
+            self._uri = f"file:{DB_CONFIG['database']}_{id(self)}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{path}"
+        # Keeps an in-memory database alive and is used to create the schema
+        self._anchor = self._open()
+        if self.config.get('init_schema', True):
+            self.init_schema(self._anchor)
+
+    def _open(self):
+        conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                               isolation_level=None, timeout=self.config.get('busy_timeout', 5),
+                               factory=SQLiteConnection)
+        conn.row_factory = _dict_row
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self._uri.endswith('cache=shared'):
+            conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def init_schema(self, conn):
+        """Create the tables and default rows if they do not exist yet, then migrate"""
+        import init_db_scheme
+
+        import migrations
+
+        exists = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+        if not exists:
+            cursor = SQLiteCursor(conn)
+            conn.execute("BEGIN")
+            for table in init_db_scheme.TABLES:
+                cursor.execute(translate_ddl(table))
+            init_db_scheme.seed_defaults(cursor, self.IntegrityError)
+            conn.execute("COMMIT")
+        migrations.upgrade(self, conn)
+
+    def connect(self):
+        return self._open()
+
+    def prepare_ddl(self, statement):
+        return translate_ddl(statement)
+
+    def index_exists(self, conn, table, name):
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                           "AND tbl_name = ? AND name = ?", (table, name)).fetchone()
+        return row is not None
+
+    def full_table_scans(self, conn, query, params=()):
+        """Tables that EXPLAIN QUERY PLAN says the query reads with a full scan"""
+        plan = conn.execute("EXPLAIN QUERY PLAN " + translate_sql(query), tuple(params)).fetchall()
+        scans = []
+        for row in plan:
+            match = _FULL_SCAN_PLAN.match(row['detail'])
+            if match:
+                scans.append(match.group(1))
+        return scans
+
+    def cursor(self, conn):
+        return SQLiteCursor(conn)
+
+    def prepared_cursor(self, conn):
+        # sqlite3 already keeps a per-connection cache of compiled statements
+        return SQLiteCursor(conn)
+
+    def begin(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
+
+    def is_connection_error(self, err):
+        return isinstance(err, sqlite3.InterfaceError) or (
+            isinstance(err, sqlite3.ProgrammingError) and 'closed' in str(err))
+
+    def is_transient_error(self, err):
+        return isinstance(err, sqlite3.OperationalError) and (
+            'locked' in str(err) or 'busy' in str(err))
+
+    def is_deadlock(self, err):
+        # "database is locked" means the statement was not applied
+        return self.is_transient_error(err)
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+def create_backend(name, config=None):
+    """Instantiate a backend by name ('mysql' or 'sqlite')"""
+    try:
+        return BACKENDS[name](config)
+    except KeyError:
+        raise ValueError(f"Unknown database backend: {name!r}") from None
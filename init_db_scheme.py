@@ -1,5 +1,4 @@
 # setup_database.py - Run this to create the database tables
-import mysql.connector
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -23,104 +22,90 @@ TEST_ACC = {
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def setup_database():
-    # First connect without database to create it
-    conn = mysql.connector.connect(
-        host=DB_CONFIG['host'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password']
+# Current schema, shared by setup_database() and the SQLite backend
+# (db_backends.py); changes must also go into a new migration (migrations.py)
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        firstname VARCHAR(50) NOT NULL,
+        middlename VARCHAR(50),
+        lastname VARCHAR(50) NOT NULL,
+        birthday DATE NOT NULL,
+        contact VARCHAR(20) NOT NULL,
+        role ENUM('user', 'admin') DEFAULT 'user',
+        is_active TINYINT(1) DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
     )
-    cursor = conn.cursor()
-    
-    # Create database
-    cursor.execute("CREATE DATABASE IF NOT EXISTS flask_blog_db")
-    print("Database created successfully!")
-    
-    cursor.close()
-    conn.close()
-    
-    # Now connect to the database
-    conn = mysql.connector.connect(
-        host=DB_CONFIG['host'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password'],
-        database=DB_CONFIG['database']
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS otp_codes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(100) NOT NULL,
+        otp_code VARCHAR(10) NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
     )
-    cursor = conn.cursor()
-    
-    # Create tables
-    tables = [
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            email VARCHAR(100) UNIQUE NOT NULL,
-            firstname VARCHAR(50) NOT NULL,
-            middlename VARCHAR(50),
-            lastname VARCHAR(50) NOT NULL,
-            birthday DATE NOT NULL,
-            contact VARCHAR(20) NOT NULL,
-            role ENUM('user', 'admin') DEFAULT 'user',
-            is_active TINYINT(1) DEFAULT 1,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS otp_codes (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            email VARCHAR(100) NOT NULL,
-            otp_code VARCHAR(10) NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS email_log (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            email VARCHAR(100) NOT NULL,
-            sent_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS pending_registrations (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(50) NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            email VARCHAR(100) NOT NULL,
-            firstname VARCHAR(50) NOT NULL,
-            middlename VARCHAR(50),
-            lastname VARCHAR(50) NOT NULL,
-            birthday DATE NOT NULL,
-            contact VARCHAR(20) NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS site_content (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            content_key VARCHAR(50) UNIQUE NOT NULL,
-            content_value TEXT,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS games (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(50) UNIQUE NOT NULL,
-            title VARCHAR(100) NOT NULL,
-            description TEXT,
-            image VARCHAR(255),
-            url VARCHAR(255) NOT NULL,
-            is_enabled TINYINT(1) DEFAULT 1,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    ]
-    
-    for table in tables:
-        cursor.execute(table)
-    print("Tables created successfully!")
-    
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS email_log (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(100) NOT NULL,
+        sent_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pending_registrations (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        firstname VARCHAR(50) NOT NULL,
+        middlename VARCHAR(50),
+        lastname VARCHAR(50) NOT NULL,
+        birthday DATE NOT NULL,
+        contact VARCHAR(20) NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS site_content (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        content_key VARCHAR(50) UNIQUE NOT NULL,
+        content_value TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) UNIQUE NOT NULL,
+        title VARCHAR(100) NOT NULL,
+        description TEXT,
+        image VARCHAR(255),
+        url VARCHAR(255) NOT NULL,
+        is_enabled TINYINT(1) DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        stat_key VARCHAR(50) PRIMARY KEY,
+        stat_value INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_signups_daily (
+        signup_date DATE PRIMARY KEY,
+        signup_count INT NOT NULL DEFAULT 0
+    )
+    """
+]
+
+def seed_defaults(cursor, integrity_error):
+    """Insert the default accounts, site content and games (skips existing rows)"""
     # Create admin user
     admin_password = hash_password(ADMIN_ACC["password"])
     try:
@@ -129,7 +114,7 @@ def setup_database():
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (ADMIN_ACC["username"], admin_password, 'admin@example.com', 'Admin', '', 'User', '2004-01-01', '09123456789', 'admin', 1))
         print("Admin user created! Username: admin, Password: admin123")
-    except mysql.connector.IntegrityError:
+    except integrity_error:
         print("Admin user already exists!")
     
     # Create test user
@@ -140,7 +125,7 @@ def setup_database():
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (TEST_ACC["username"], user_password, 'user@example.com', 'Testing', 'Testing', 'Testing', '2005-05-15', '09987654321', 'user', 1))
         print("Test user created! Username: testuser, Password: user123")
-    except mysql.connector.IntegrityError:
+    except integrity_error:
         print("Test user already exists!")
     
     # Insert default site content
@@ -158,7 +143,7 @@ def setup_database():
                 INSERT INTO site_content (content_key, content_value)
                 VALUES (%s, %s)
             """, (key, value))
-        except mysql.connector.IntegrityError:
+        except integrity_error:
             pass
     print("Default site content added!")
     
@@ -177,12 +162,50 @@ def setup_database():
                 INSERT INTO games (name, title, description, image, url, is_enabled)
                 VALUES (%s, %s, %s, %s, %s, 1)
             """, (name, title, desc, img, url))
-        except mysql.connector.IntegrityError:
+        except integrity_error:
             pass
     print("Default games added!")
+
+def setup_database():
+    import mysql.connector
+
+    # First connect without database to create it
+    conn = mysql.connector.connect(
+        host=DB_CONFIG['host'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password']
+    )
+    cursor = conn.cursor()
+    
+    # Create database
+    cursor.execute("CREATE DATABASE IF NOT EXISTS flask_blog_db")
+    print("Database created successfully!")
+    
+    cursor.close()
+    conn.close()
+    
+    # Now connect to the database
+    conn = mysql.connector.connect(
+        host=DB_CONFIG['host'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        database=DB_CONFIG['database']
+    )
+    cursor = conn.cursor()
+    
+    for table in TABLES:
+        cursor.execute(table)
+    print("Tables created successfully!")
+    
+    seed_defaults(cursor, mysql.connector.IntegrityError)
     
     conn.commit()
     cursor.close()
+    
+    # Bring an existing schema up to date (indexes, later changes)
+    import migrations
+    from db_backends import MySQLBackend
+    migrations.upgrade(MySQLBackend(DB_CONFIG), conn)
     conn.close()
     
     print("\n=== Database setup complete! ===")
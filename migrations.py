@@ -0,0 +1,292 @@
+# migrations.py - Versioned Schema Migrations
+# Usage: python migrations.py [upgrade|status|explain]
+import sys
+
+class Index:
+    """CREATE INDEX step (skipped if an index with that name already exists)"""
+
+    def __init__(self, table, name, columns):
+        self.table = table
+        self.name = name
+        self.columns = columns
+
+    def apply(self, backend, conn, cursor):
+        if backend.index_exists(conn, self.table, self.name):
+            return
+        cursor.execute(f"CREATE INDEX {self.name} ON {self.table} ({self.columns})")
+
+    def __str__(self):
+        return f"index {self.name} on {self.table} ({self.columns})"
+
+def seed_user_counters(backend, conn, cursor):
+    """Build user_stats / user_signups_daily from users unless already built"""
+    cursor.execute("SELECT 1 FROM user_stats WHERE stat_key = 'initialised'")
+    if cursor.fetchall():
+        return
+    # Drop deltas written before the counters existed as a whole
+    cursor.execute("DELETE FROM user_stats")
+    cursor.execute("DELETE FROM user_signups_daily")
+    cursor.execute("""
+        INSERT INTO user_signups_daily (signup_date, signup_count)
+        SELECT DATE(created_at), COUNT(*) FROM users
+        WHERE created_at IS NOT NULL
+        GROUP BY DATE(created_at)
+    """)
+    cursor.execute("""
+        INSERT INTO user_stats (stat_key, stat_value)
+        SELECT 'total', COUNT(*) FROM users
+        UNION ALL SELECT 'active', COALESCE(SUM(is_active = 1), 0) FROM users
+        UNION ALL SELECT 'inactive', COALESCE(SUM(is_active = 0), 0) FROM users
+        UNION ALL SELECT 'role_admin', COALESCE(SUM(role = 'admin'), 0) FROM users
+        UNION ALL SELECT 'role_user', COALESCE(SUM(role = 'user'), 0) FROM users
+        UNION ALL SELECT 'initialised', 1
+    """)
+
+# (version, description, steps). Steps are DDL strings, Index objects or
+# functions called with (backend, conn, cursor).
+# Never edit a migration that has shipped - add a new one instead.
+MIGRATIONS = [
+    (1, 'Initial schema', [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            firstname VARCHAR(50) NOT NULL,
+            middlename VARCHAR(50),
+            lastname VARCHAR(50) NOT NULL,
+            birthday DATE NOT NULL,
+            contact VARCHAR(20) NOT NULL,
+            role ENUM('user', 'admin') DEFAULT 'user',
+            is_active TINYINT(1) DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS otp_codes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(100) NOT NULL,
+            otp_code VARCHAR(10) NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS email_log (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(100) NOT NULL,
+            sent_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS pending_registrations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            firstname VARCHAR(50) NOT NULL,
+            middlename VARCHAR(50),
+            lastname VARCHAR(50) NOT NULL,
+            birthday DATE NOT NULL,
+            contact VARCHAR(20) NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS site_content (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            content_key VARCHAR(50) UNIQUE NOT NULL,
+            content_value TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS games (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) UNIQUE NOT NULL,
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            image VARCHAR(255),
+            url VARCHAR(255) NOT NULL,
+            is_enabled TINYINT(1) DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, 'Indexes for OTP, email log, registration and user list lookups', [
+        Index('otp_codes', 'idx_otp_codes_email_created', 'email, created_at'),
+        Index('email_log', 'idx_email_log_email_sent', 'email, sent_at'),
+        Index('pending_registrations', 'idx_pending_email', 'email'),
+        Index('users', 'idx_users_active_id', 'is_active, id'),
+        Index('users', 'idx_users_role', 'role'),
+    ]),
+    (3, 'Indexes for the expired-row purge', [
+        Index('otp_codes', 'idx_otp_codes_created', 'created_at'),
+        Index('email_log', 'idx_email_log_sent', 'sent_at'),
+        Index('pending_registrations', 'idx_pending_created', 'created_at'),
+    ]),
+    (4, 'User counter tables', [
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            stat_key VARCHAR(50) PRIMARY KEY,
+            stat_value INT NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_signups_daily (
+            signup_date DATE PRIMARY KEY,
+            signup_count INT NOT NULL DEFAULT 0
+        )
+        """,
+        seed_user_counters,
+    ]),
+]
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# ============ RUNNER ============
+
+def applied_versions(backend, conn):
+    """Versions already recorded in schema_migrations"""
+    cursor = backend.cursor(conn)
+    try:
+        cursor.execute(backend.prepare_ddl(VERSION_TABLE))
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row['version'] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def upgrade(backend, conn):
+    """Apply every migration not yet recorded, in order. Returns the applied versions."""
+    done = applied_versions(backend, conn)
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version in done:
+            continue
+        cursor = backend.cursor(conn)
+        try:
+            for step in steps:
+                if isinstance(step, Index):
+                    step.apply(backend, conn, cursor)
+                elif callable(step):
+                    step(backend, conn, cursor)
+                else:
+                    cursor.execute(backend.prepare_ddl(step))
+            cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                           (version, description))
+            conn.commit()
+        finally:
+            cursor.close()
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+def status(backend, conn):
+    """[(version, description, applied)] for every known migration"""
+    done = applied_versions(backend, conn)
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+
+# ============ QUERY PLANS ============
+# Every statement models.py runs (its *_QUERY constants and query builders),
+# with sample parameters. `explain` fails if one of them needs a full table
+# scan, except where reading the whole table is the point (small lookup
+# tables, rebuilds, bounded newest-first pages).
+
+def query_catalog():
+    """[(name, query, params, full_scan_ok)] built from the queries in models.py"""
+    import models
+
+    user = ('neo', 'hash', 'neo@example.com', 'Neo', '', 'Anderson', '2000-01-01', '0912')
+    catalog = [
+        ('create user', models.CREATE_USER_QUERY, user + ('user',), False),
+        ('user by id', models.USER_BY_ID_QUERY, (1,), False),
+        ('user by username / login', models.USER_BY_USERNAME_QUERY, ('admin',), False),
+        ('user by email', models.USER_BY_EMAIL_QUERY, ('admin@example.com',), False),
+        ('homepage admin row', models.ADMIN_USER_QUERY, (), False),
+        ('update profile', models.UPDATE_USER_QUERY,
+         ('Neo', '', 'Anderson', '2000-01-01', '0912', 'neo@example.com', 1), False),
+        ('user status change', models.USER_STATUS_QUERY, (0, 1, 0), False),
+        ('lock user row', models.LOCK_USER_QUERY, (1,), False),
+        ('delete user', models.DELETE_USER_QUERY, (1,), False),
+        ('admin update user', models.ADMIN_UPDATE_USER_QUERY,
+         ('neo', 'neo@example.com', 'Neo', '', 'Anderson', '2000-01-01', '0912', 'user', 1), False),
+        ('bump counter', models.BUMP_STAT_QUERY, ('total', 1), False),
+        ('count signup', models.COUNT_SIGNUP_QUERY, (), False),
+        ('rebuild totals', models.USER_TOTALS_QUERY, (), True),
+        ('rebuild signups', models.USER_SIGNUPS_QUERY, (), True),
+        ('clear counters', models.CLEAR_STATS_QUERY, (), True),
+        ('clear signups', models.CLEAR_SIGNUPS_QUERY, (), True),
+        ('insert counter', models.INSERT_STAT_QUERY, ('total', 0), False),
+        ('insert signups', models.INSERT_SIGNUPS_QUERY, ('2024-01-01', 0), False),
+        ('user counters', models.USER_STATS_QUERY, (), True),
+        ('signups per day', models.SIGNUPS_PER_DAY_QUERY, (14,), False),
+        ('registration check', models.REGISTRATION_CHECK_QUERY,
+         ('admin', 'admin@example.com'), False),
+        ('save pending', models.SAVE_PENDING_QUERY, user, False),
+        ('pending clear', models.CLEAR_PENDING_QUERY, ('a@example.com',), False),
+        ('pending by email', models.PENDING_BY_EMAIL_QUERY, ('a@example.com',), False),
+        ('complete registration', models.COMPLETE_REGISTRATION_QUERY, ('a@example.com',), False),
+        ('site content', models.SITE_CONTENT_QUERY, (), True),
+        ('save site content', models.SAVE_SITE_CONTENT_QUERY, ('tagline', 'Hi'), False),
+        ('game catalog', models.GAMES_QUERY, (), True),
+        ('game by id', models.GAME_BY_ID_QUERY, (1,), False),
+        ('game status change', models.GAME_STATUS_QUERY, (0, 1), False),
+    ]
+    for by_status in (False, True):
+        for after_cursor in (False, True):
+            params = (1,) * by_status + (1000,) * after_cursor + (21,)
+            # Unfiltered first pages read newest-first from the end of the primary key
+            catalog.append((f"users page (status={by_status}, cursor={after_cursor})",
+                            models.users_page_query(by_status, after_cursor), params,
+                            not by_status and not after_cursor))
+    for table in models.EXPIRING_TABLES:
+        catalog.append((f"purge {table}", models.purge_select_query(table), (5, 500), False))
+        catalog.append((f"purge {table} delete", models.purge_delete_query(table, 3),
+                        (1, 2, 3), False))
+    return catalog
+
+def explain(backend, conn):
+    """[(name, tables)] for catalog queries that unexpectedly scan whole tables"""
+    problems = []
+    for name, query, params, full_scan_ok in query_catalog():
+        scans = backend.full_table_scans(conn, query, params)
+        if scans and not full_scan_ok:
+            problems.append((name, scans))
+    return problems
+
+# ============ CLI ============
+
+def main(argv):
+    import database
+
+    command = argv[1] if len(argv) > 1 else 'upgrade'
+    if command not in ('upgrade', 'status', 'explain'):
+        print("Usage: python migrations.py [upgrade|status|explain]")
+        return 2
+    backend = database.get_backend()
+    conn = backend.connect()
+    try:
+        if command == 'upgrade':
+            if not upgrade(backend, conn):
+                print("Schema is up to date.")
+        elif command == 'status':
+            for version, description, applied in status(backend, conn):
+                print(f"{version:>4}  {'applied' if applied else 'PENDING':<8} {description}")
+        else:
+            problems = explain(backend, conn)
+            for name, tables in problems:
+                print(f"Full table scan: {name} ({', '.join(tables)})")
+            print(f"Checked {len(query_catalog())} queries, {len(problems)} with unexpected full scans")
+            return 1 if problems else 0
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
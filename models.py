@@ -1,238 +1,590 @@
 # models.py - User Model and Database Operations
-from database import execute_query, execute_one
+from database import execute_query, execute_one, transaction, DatabaseError
+from config import (USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE, SITE_CACHE_TTL, GAME_CACHE_TTL,
+                    USER_CACHE_TTL, USER_CACHE_SIZE)
+from utils.cache import TTLCache, LRUCache
+from flask import g, has_request_context
 from datetime import datetime
 import hashlib
 
+# SQL lives in module-level *_QUERY constants (and the *_query() builders
+# for dynamic ones) so `python migrations.py explain` checks the exact
+# statements this module runs.
+
+# Homepage data: site content + admin profile row
+site_cache = TTLCache('site', SITE_CACHE_TTL)
+
+# User rows by id, and username/email -> id (checked against the row on use)
+user_cache = LRUCache('users', USER_CACHE_TTL, USER_CACHE_SIZE)
+user_key_cache = LRUCache('user_keys', USER_CACHE_TTL, USER_CACHE_SIZE)
+
 def hash_password(password):
     """Simple password hashing"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 # ============ USER OPERATIONS ============
 
+class UserSummary:
+    """Compact read-only user row for list views (no password, birthday or timestamps)"""
+
+    COLUMNS = ('id', 'username', 'email', 'firstname', 'middlename', 'lastname',
+               'contact', 'role', 'is_active')
+    __slots__ = COLUMNS
+
+    def __init__(self, row):
+        for column in self.COLUMNS:
+            setattr(self, column, row[column])
+
+    def __getitem__(self, column):
+        # Lets code written for dict rows keep using user['id']
+        return getattr(self, column)
+
+    def __repr__(self):
+        return f"<UserSummary {self.id} {self.username!r}>"
+
+USER_SUMMARY_COLUMNS = ', '.join(UserSummary.COLUMNS)
+
+CREATE_USER_QUERY = """
+    INSERT INTO users (username, password, email, firstname, middlename, 
+                      lastname, birthday, contact, role, is_active, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 1, NOW())
+"""
+USER_BY_ID_QUERY = "SELECT * FROM users WHERE id = %s"
+USER_BY_USERNAME_QUERY = "SELECT * FROM users WHERE username = %s"
+USER_BY_EMAIL_QUERY = "SELECT * FROM users WHERE email = %s"
+ADMIN_USER_QUERY = """
+    SELECT id, username, email, firstname, middlename, lastname, birthday, contact
+    FROM users WHERE role = 'admin' LIMIT 1
+"""
+UPDATE_USER_QUERY = """
+    UPDATE users SET firstname=%s, middlename=%s, lastname=%s, 
+                    birthday=%s, contact=%s, email=%s
+    WHERE id = %s
+"""
+USER_STATUS_QUERY = "UPDATE users SET is_active = %s WHERE id = %s AND is_active <> %s"
+LOCK_USER_QUERY = "SELECT is_active, role FROM users WHERE id = %s FOR UPDATE"
+DELETE_USER_QUERY = "DELETE FROM users WHERE id = %s"
+ADMIN_UPDATE_USER_QUERY = """
+    UPDATE users SET username=%s, email=%s, firstname=%s, middlename=%s, 
+                    lastname=%s, birthday=%s, contact=%s, role=%s
+    WHERE id = %s
+"""
+
+def users_page_query(by_status, after_cursor):
+    """SELECT for one keyset page of users (see get_users_page)"""
+    conditions = []
+    if by_status:
+        conditions.append("is_active = %s")
+    if after_cursor:
+        conditions.append("id < %s")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {USER_SUMMARY_COLUMNS} FROM users {where} ORDER BY id DESC LIMIT %s"
+
 def create_user(username, password, email, firstname, middlename, lastname, 
                 birthday, contact, role='user'):
     """Create a new user in the database"""
     hashed_pw = hash_password(password)
-    query = """
-        INSERT INTO users (username, password, email, firstname, middlename, 
-                          lastname, birthday, contact, role, is_active, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 1, NOW())
-    """
     params = (username, hashed_pw, email, firstname, middlename, lastname, 
               birthday, contact, role)
-    return execute_query(query, params)
+    try:
+        with transaction() as tx:
+            user_id = tx.execute(CREATE_USER_QUERY, params)
+            _add_user_stats(tx, is_active=1, role=role)
+            _count_signup(tx)
+            return user_id
+    except DatabaseError:
+        return None
+    finally:
+        _user_changed(None)
 
 def get_user_by_username(username):
     """Get user by username"""
-    query = "SELECT * FROM users WHERE username = %s"
-    return execute_one(query, (username,))
+    return _find_user('username', username, USER_BY_USERNAME_QUERY)
 
 def get_user_by_email(email):
     """Get user by email"""
-    query = "SELECT * FROM users WHERE email = %s"
-    return execute_one(query, (email,))
+    return _find_user('email', email, USER_BY_EMAIL_QUERY)
 
 def get_user_by_id(user_id):
     """Get user by ID"""
-    query = "SELECT * FROM users WHERE id = %s"
-    return execute_one(query, (user_id,))
+    return _find_user('id', user_id, USER_BY_ID_QUERY)
+
+# ============ USER LOOKUP CACHES ============
+# Lookups go through two layers before the database:
+#   1. a per-request identity map on flask.g, so every lookup of the same
+#      user (by id, username or email) within a request shares one row;
+#   2. a per-worker LRU cache of rows by id. Username/email lookups go
+#      through an index to the id and are only trusted while the cached row
+#      still carries that username/email, so a write only has to drop the row.
+# Misses are never cached across requests (registration checks must see new users).
+
+def _identity_map():
+    """Per-request {(field, value): row} map on flask.g (None outside a request)"""
+    if not has_request_context():
+        return None
+    if 'user_identity_map' not in g:
+        g.user_identity_map = {}
+    return g.user_identity_map
+
+def _cache_key(field, value):
+    """Normalised (field, value) key, or None if the value cannot be cached"""
+    if field == 'id':
+        try:
+            return ('id', int(value))
+        except (TypeError, ValueError):
+            return None
+    if not isinstance(value, str):
+        return None
+    return (field, value.lower())  # MySQL compares these case-insensitively
+
+def _cached_user(key):
+    field, value = key
+    user_id = value if field == 'id' else user_key_cache.get(key)
+    if user_id is None:
+        return None
+    user = user_cache.get(user_id)
+    if user is None or (field != 'id' and str(user[field]).lower() != value):
+        return None
+    return user
+
+def _cache_user(user, generation):
+    user_cache.set(user['id'], user, generation)
+    for field in ('username', 'email'):
+        key = _cache_key(field, user[field])
+        if key:
+            user_key_cache.set(key, user['id'])
+
+def _find_user(field, value, query):
+    """Look a user up through the identity map and user cache, querying on a miss"""
+    identity = _identity_map()
+    if identity is not None and (field, value) in identity:
+        return identity[(field, value)]
+    key = _cache_key(field, value)
+    user = _cached_user(key) if key else None
+    if user is None:
+        generation = user_cache.generation
+        # Primary only: a replica may still return the row as it was before
+        # the write that just dropped it from the cache
+        user = execute_one(query, (value,), prepared=True, primary=True)
+        if user and key:
+            _cache_user(user, generation)
+    if identity is not None:
+        identity[(field, value)] = user  # a miss is remembered too, until the next user write
+        if user:
+            _remember_user(identity, user)
+    return user
+
+def _remember_user(identity, user):
+    for field in ('id', 'username', 'email'):
+        identity[(field, user[field])] = user
+
+def _user_changed(user_id):
+    """Drop cached copies of a user row after it was written"""
+    identity = _identity_map()
+    if identity is not None:
+        # Clear everything: usernames/emails may have moved between rows and
+        # remembered misses may now exist
+        identity.clear()
+    if user_id is not None:
+        user_cache.invalidate(int(user_id))
+    # The homepage shows the admin row, so any user write may affect it
+    site_cache.invalidate('admin_user')
 
 def verify_login(username, password):
     """Verify user login credentials"""
-    user = get_user_by_username(username)
+    # Always read the stored row: a worker's cached copy may predate a
+    # deactivation done on another worker
+    user = execute_one(USER_BY_USERNAME_QUERY, (username,), prepared=True)
     if user and user['password'] == hash_password(password):
         if user['is_active'] == 1:
             return user
     return None
 
 def get_admin_user():
-    """Get the first admin user for homepage display"""
-    query = "SELECT * FROM users WHERE role = 'admin' LIMIT 1"
-    return execute_one(query)
+    """Get the first admin user for homepage display (cached)"""
+    return site_cache.get_or_load('admin_user', _load_admin_user)
 
-def get_all_users():
-    """Get all users from database"""
-    query = "SELECT * FROM users ORDER BY id DESC"
-    return execute_query(query, fetch=True)
+def _load_admin_user():
+    return execute_one(ADMIN_USER_QUERY, prepared=True, primary=True)
 
-def get_active_users():
-    """Get only active users from database"""
-    query = "SELECT * FROM users WHERE is_active = 1 ORDER BY id DESC"
-    return execute_query(query, fetch=True)
+def get_users_page(is_active=None, before_id=None, limit=USERS_PAGE_SIZE):
+    """Get one page of users (as UserSummary rows), newest first.
 
-def get_inactive_users():
-    """Get only inactive users from database"""
-    query = "SELECT * FROM users WHERE is_active = 0 ORDER BY id DESC"
-    return execute_query(query, fetch=True)
+    Keyset pagination: pass the returned next cursor as `before_id` to get
+    the following page. Returns (users, next_cursor); next_cursor is None on
+    the last page.
+    """
+    limit = max(1, min(int(limit), USERS_MAX_PAGE_SIZE))
+    params = []
+    if is_active is not None:
+        params.append(1 if is_active else 0)
+    if before_id:
+        params.append(before_id)
+    query = users_page_query(is_active is not None, bool(before_id))
+    # Fetch one extra row to know whether there is a next page
+    rows = execute_query(query, tuple(params) + (limit + 1,), fetch=True) or []
+    users = [UserSummary(row) for row in rows]
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+    return users[:limit], next_cursor
+
+def get_recent_users(limit=5):
+    """Get the newest users"""
+    users, _ = get_users_page(limit=limit)
+    return users
 
 def update_user(user_id, firstname, middlename, lastname, birthday, contact, email):
     """Update user profile information"""
-    query = """
-        UPDATE users SET firstname=%s, middlename=%s, lastname=%s, 
-                        birthday=%s, contact=%s, email=%s
-        WHERE id = %s
-    """
     params = (firstname, middlename, lastname, birthday, contact, email, user_id)
-    return execute_query(query, params)
+    result = execute_query(UPDATE_USER_QUERY, params)
+    _user_changed(user_id)
+    return result
 
 def update_user_status(user_id, is_active):
     """Activate or deactivate a user"""
-    query = "UPDATE users SET is_active = %s WHERE id = %s"
-    return execute_query(query, (is_active, user_id))
+    try:
+        with transaction() as tx:
+            tx.execute(USER_STATUS_QUERY, (is_active, user_id, is_active))
+            if tx.rowcount:
+                change = 1 if is_active else -1
+                _bump_stats(tx, {'active': change, 'inactive': -change})
+            return tx.lastrowid
+    except DatabaseError:
+        return None
+    finally:
+        _user_changed(user_id)
 
 def delete_user(user_id):
     """Delete a user from database"""
-    query = "DELETE FROM users WHERE id = %s"
-    return execute_query(query, (user_id,))
+    try:
+        with transaction() as tx:
+            user = tx.fetch_one(LOCK_USER_QUERY, (user_id,))
+            tx.execute(DELETE_USER_QUERY, (user_id,))
+            if user and tx.rowcount:
+                _add_user_stats(tx, user['is_active'], user['role'], sign=-1)
+            return tx.lastrowid
+    except DatabaseError:
+        return None
+    finally:
+        _user_changed(user_id)
 
 def admin_update_user(user_id, username, email, firstname, middlename, lastname, 
                       birthday, contact, role):
     """Admin update user with all fields"""
-    query = """
-        UPDATE users SET username=%s, email=%s, firstname=%s, middlename=%s, 
-                        lastname=%s, birthday=%s, contact=%s, role=%s
-        WHERE id = %s
-    """
     params = (username, email, firstname, middlename, lastname, birthday, 
               contact, role, user_id)
-    return execute_query(query, params)
-
-# ============ OTP OPERATIONS ============
-
-def save_otp(email, otp_code):
-    """Save OTP to database"""
-    # Delete old OTPs for this email first
-    delete_query = "DELETE FROM otp_codes WHERE email = %s"
-    execute_query(delete_query, (email,))
-    
-    # Insert new OTP
-    query = "INSERT INTO otp_codes (email, otp_code, created_at) VALUES (%s, %s, NOW())"
-    return execute_query(query, (email, otp_code))
-
-def verify_otp(email, otp_code):
-    """Verify OTP code"""
-    query = """
-        SELECT * FROM otp_codes 
-        WHERE email = %s AND otp_code = %s 
-        AND created_at > DATE_SUB(NOW(), INTERVAL 5 MINUTE)
-    """
-    result = execute_one(query, (email, otp_code))
-    if result:
-        # Delete used OTP
-        delete_query = "DELETE FROM otp_codes WHERE email = %s"
-        execute_query(delete_query, (email,))
-        return True
-    return False
-
-def check_email_spam(email):
-    """Check if too many OTPs sent recently (spam prevention)"""
-    query = """
-        SELECT COUNT(*) as count FROM email_log 
-        WHERE email = %s AND sent_at > DATE_SUB(NOW(), INTERVAL 1 HOUR)
-    """
-    result = execute_one(query, (email,))
-    if result and result['count'] >= 3:
-        return True  # Too many emails sent
-    return False
-
-def log_email_sent(email):
-    """Log email sent for spam prevention"""
-    query = "INSERT INTO email_log (email, sent_at) VALUES (%s, NOW())"
-    return execute_query(query, (email,))
+    try:
+        with transaction() as tx:
+            old = tx.fetch_one(LOCK_USER_QUERY, (user_id,))
+            result = tx.execute(ADMIN_UPDATE_USER_QUERY, params)
+            if old and old['role'] != role:
+                _bump_stats(tx, {f"role_{old['role']}": -1, f"role_{role}": 1})
+            return result
+    except DatabaseError:
+        return None
+    finally:
+        _user_changed(user_id)
+
+# ============ USER STATISTICS ============
+# Counters in user_stats / user_signups_daily are kept up to date in the same
+# transaction as every user insert, status/role change and delete, so the
+# dashboard reads a handful of rows no matter how many users there are.
+# The 'initialised' row marks counters built from the users table: deltas
+# written before that (e.g. a signup on a freshly upgraded database) do not
+# count as initialisation, so the first read rebuilds them.
+
+STATS_INITIALISED = 'initialised'
+
+BUMP_STAT_QUERY = """
+    INSERT INTO user_stats (stat_key, stat_value) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE stat_value = stat_value + VALUES(stat_value)
+"""
+COUNT_SIGNUP_QUERY = """
+    INSERT INTO user_signups_daily (signup_date, signup_count) VALUES (CURDATE(), 1)
+    ON DUPLICATE KEY UPDATE signup_count = signup_count + 1
+"""
+USER_TOTALS_QUERY = """
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(is_active = 1), 0) AS active,
+           COALESCE(SUM(is_active = 0), 0) AS inactive,
+           COALESCE(SUM(role = 'admin'), 0) AS role_admin,
+           COALESCE(SUM(role = 'user'), 0) AS role_user
+    FROM users
+"""
+USER_SIGNUPS_QUERY = """
+    SELECT DATE(created_at) AS signup_date, COUNT(*) AS signup_count
+    FROM users GROUP BY DATE(created_at)
+"""
+CLEAR_STATS_QUERY = "DELETE FROM user_stats"
+CLEAR_SIGNUPS_QUERY = "DELETE FROM user_signups_daily"
+INSERT_STAT_QUERY = "INSERT INTO user_stats (stat_key, stat_value) VALUES (%s, %s)"
+INSERT_SIGNUPS_QUERY = "INSERT INTO user_signups_daily (signup_date, signup_count) VALUES (%s, %s)"
+USER_STATS_QUERY = "SELECT stat_key, stat_value FROM user_stats"
+SIGNUPS_PER_DAY_QUERY = """
+    SELECT signup_date, signup_count FROM user_signups_daily
+    WHERE signup_date > DATE_SUB(NOW(), INTERVAL %s DAY)
+    ORDER BY signup_date
+"""
+
+def _bump_stats(tx, deltas):
+    """Add deltas ({stat_key: +/-n}) to user_stats inside an open transaction"""
+    rows = [(key, delta) for key, delta in deltas.items() if delta]
+    if rows:
+        tx.executemany(BUMP_STAT_QUERY, rows)
+
+def _add_user_stats(tx, is_active, role, sign=1):
+    """Count a user in (sign=1) or out of (sign=-1) the totals"""
+    _bump_stats(tx, {
+        'total': sign,
+        'active' if is_active else 'inactive': sign,
+        f'role_{role}': sign,
+    })
+
+def _count_signup(tx):
+    tx.execute(COUNT_SIGNUP_QUERY)
+
+def rebuild_user_stats():
+    """Recompute all user counters from the users table (one full scan)"""
+    try:
+        with transaction() as tx:
+            totals = tx.fetch_one(USER_TOTALS_QUERY)
+            signups = tx.fetch_all(USER_SIGNUPS_QUERY)
+            tx.execute(CLEAR_STATS_QUERY)
+            tx.execute(CLEAR_SIGNUPS_QUERY)
+            tx.executemany(INSERT_STAT_QUERY,
+                           [(key, int(value)) for key, value in totals.items()]
+                           + [(STATS_INITIALISED, 1)])
+            rows = [(row['signup_date'], row['signup_count']) for row in signups
+                    if row['signup_date'] is not None]
+            if rows:
+                tx.executemany(INSERT_SIGNUPS_QUERY, rows)
+            return True
+    except DatabaseError:
+        return False
+
+def get_user_stats(days=14):
+    """Get user counts (total, active/inactive, by role) and signups per day"""
+    rows = execute_query(USER_STATS_QUERY, fetch=True, prepared=True)
+    if rows is not None and not any(row['stat_key'] == STATS_INITIALISED for row in rows):
+        # Counters were never built from the users table (e.g. upgraded database)
+        rebuild_user_stats()
+        rows = execute_query(USER_STATS_QUERY, fetch=True, prepared=True)
+    counts = {row['stat_key']: int(row['stat_value']) for row in rows or []}
+
+    signups = execute_query(SIGNUPS_PER_DAY_QUERY, (days,), fetch=True) or []
+    return {
+        'total': counts.get('total', 0),
+        'active': counts.get('active', 0),
+        'inactive': counts.get('inactive', 0),
+        'by_role': {key[len('role_'):]: value for key, value in counts.items()
+                    if key.startswith('role_')},
+        'signups_per_day': [(str(row['signup_date']), row['signup_count']) for row in signups],
+    }
 
 # ============ PENDING REGISTRATION ============
+# OTP codes themselves live in utils/otp_store.py, not in the database.
+
+REGISTRATION_CHECK_QUERY = """
+    SELECT
+        EXISTS (SELECT 1 FROM users WHERE username = %s) AS username_taken,
+        EXISTS (SELECT 1 FROM users WHERE email = %s) AS email_taken
+"""
+SAVE_PENDING_QUERY = """
+    INSERT INTO pending_registrations 
+    (username, password, email, firstname, middlename, lastname, birthday, contact, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+"""
+CLEAR_PENDING_QUERY = "DELETE FROM pending_registrations WHERE email = %s"
+PENDING_BY_EMAIL_QUERY = "SELECT * FROM pending_registrations WHERE email = %s"
+COMPLETE_REGISTRATION_QUERY = """
+    INSERT INTO users (username, password, email, firstname, middlename, 
+                      lastname, birthday, contact, role, is_active, created_at)
+    SELECT username, password, email, firstname, middlename, 
+           lastname, birthday, contact, 'user', 1, NOW()
+    FROM pending_registrations WHERE email = %s
+    ORDER BY id DESC LIMIT 1
+"""
+
+def check_registration(username, email):
+    """Check username and email uniqueness in one query.
+
+    Returns {'username_taken', 'email_taken'} (booleans); None if the
+    database could not be queried.
+    """
+    result = execute_one(REGISTRATION_CHECK_QUERY, (username, email))
+    if not result:
+        return None
+    return {
+        'username_taken': bool(result['username_taken']),
+        'email_taken': bool(result['email_taken']),
+    }
 
 def save_pending_registration(username, password, email, firstname, middlename, 
                               lastname, birthday, contact):
-    """Save pending registration data"""
-    # Delete old pending registration for this email
-    delete_query = "DELETE FROM pending_registrations WHERE email = %s"
-    execute_query(delete_query, (email,))
-    
+    """Save pending registration data (replaces any older one for this email)"""
     hashed_pw = hash_password(password)
-    query = """
-        INSERT INTO pending_registrations 
-        (username, password, email, firstname, middlename, lastname, birthday, contact, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-    """
     params = (username, hashed_pw, email, firstname, middlename, lastname, birthday, contact)
-    return execute_query(query, params)
+    try:
+        with transaction() as tx:
+            tx.execute(CLEAR_PENDING_QUERY, (email,))
+            return tx.execute(SAVE_PENDING_QUERY, params)
+    except DatabaseError:
+        return None
 
 def get_pending_registration(email):
     """Get pending registration by email"""
-    query = "SELECT * FROM pending_registrations WHERE email = %s"
-    return execute_one(query, (email,))
+    return execute_one(PENDING_BY_EMAIL_QUERY, (email,))
 
 def complete_registration(email):
-    """Complete registration by moving from pending to users"""
-    pending = get_pending_registration(email)
-    if pending:
-        query = """
-            INSERT INTO users (username, password, email, firstname, middlename, 
-                              lastname, birthday, contact, role, is_active, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'user', 1, NOW())
-        """
-        params = (pending['username'], pending['password'], pending['email'], 
-                  pending['firstname'], pending['middlename'], pending['lastname'],
-                  pending['birthday'], pending['contact'])
-        result = execute_query(query, params)
-        
-        # Delete pending registration
-        delete_query = "DELETE FROM pending_registrations WHERE email = %s"
-        execute_query(delete_query, (email,))
-        
-        return result
-    return None
+    """Complete registration by moving from pending to users (one transaction)"""
+    try:
+        with transaction() as tx:
+            user_id = tx.execute(COMPLETE_REGISTRATION_QUERY, (email,))
+            if tx.rowcount == 0:
+                return None
+            tx.execute(CLEAR_PENDING_QUERY, (email,))
+            _add_user_stats(tx, is_active=1, role='user')
+            _count_signup(tx)
+            return user_id
+    except DatabaseError:
+        return None
+    finally:
+        _user_changed(None)
+
+# ============ EXPIRED ROWS ============
+
+# Table -> timestamp column that decides when a row has expired
+EXPIRING_TABLES = {
+    'otp_codes': 'created_at',
+    'email_log': 'sent_at',
+    'pending_registrations': 'created_at',
+}
+
+def purge_select_query(table):
+    """SELECT for the ids of expired rows (params: retention minutes, batch size)"""
+    column = EXPIRING_TABLES[table]
+    return f"""
+        SELECT id FROM {table}
+        WHERE {column} < DATE_SUB(NOW(), INTERVAL %s MINUTE)
+        ORDER BY {column} LIMIT %s
+    """
+
+def purge_delete_query(table, count):
+    """DELETE of `count` rows of a table by primary key"""
+    placeholders = ', '.join(['%s'] * count)
+    return f"DELETE FROM {table} WHERE id IN ({placeholders})"
+
+def purge_expired_rows(table, retention_minutes, batch_size=500):
+    """Delete up to batch_size rows older than the retention; returns rows deleted.
+
+    Raises DatabaseError (or DatabaseUnavailable) instead of swallowing it, so
+    the purge worker can report the failed run.
+    """
+    # Pick the ids first so the DELETE only locks those rows by primary key
+    with transaction() as tx:
+        rows = tx.fetch_all(purge_select_query(table), (retention_minutes, batch_size))
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        tx.execute(purge_delete_query(table, len(ids)), tuple(ids))
+        return tx.rowcount
 
 # ============ SITE CONTENT OPERATIONS ============
 
+SITE_CONTENT_QUERY = "SELECT content_key, content_value, updated_at FROM site_content"
+SAVE_SITE_CONTENT_QUERY = """
+    INSERT INTO site_content (content_key, content_value) 
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE content_value = VALUES(content_value), updated_at = NOW()
+"""
+
 def get_site_content():
-    """Get all site content as dictionary"""
-    query = "SELECT content_key, content_value FROM site_content"
-    results = execute_query(query, fetch=True)
+    """Get all site content as dictionary (cached)"""
+    loaded = site_cache.get_or_load('site_content', _load_site_content)
+    return loaded[0] if loaded else {}
+
+def get_site_content_updated():
+    """When site content last changed (cached; None if unknown)"""
+    loaded = site_cache.get_or_load('site_content', _load_site_content)
+    return loaded[1] if loaded else None
+
+def _load_site_content():
+    # Primary only: right after /admin/content cleared the cache a replica
+    # may still hold the old content, which would then be cached for the TTL
+    results = execute_query(SITE_CONTENT_QUERY, fetch=True, prepared=True, primary=True)
+    if results is None:
+        return None  # database error: do not cache
     content = {}
-    if results:
-        for row in results:
-            content[row['content_key']] = row['content_value']
-    return content
-
-def update_site_content(content_key, content_value):
-    """Update site content by key"""
-    query = """
-        INSERT INTO site_content (content_key, content_value) 
-        VALUES (%s, %s)
-        ON DUPLICATE KEY UPDATE content_value = %s
-    """
-    return execute_query(query, (content_key, content_value, content_value))
+    updated = None
+    for row in results:
+        content[row['content_key']] = row['content_value']
+        if row['updated_at'] is not None and (updated is None or row['updated_at'] > updated):
+            updated = row['updated_at']
+    return content, updated
+
+def update_site_contents(items):
+    """Update several site content keys in one transaction"""
+    try:
+        with transaction() as tx:
+            return tx.executemany(SAVE_SITE_CONTENT_QUERY, list(items))
+    except DatabaseError:
+        return None
+    finally:
+        site_cache.invalidate('site_content')
 
 # ============ GAME OPERATIONS ============
+# The catalog is tiny and only changes through toggle_game_status, so it is
+# loaded once into an in-memory registry keyed by name.
+
+game_cache = TTLCache('games', GAME_CACHE_TTL)
+
+GAMES_QUERY = "SELECT * FROM games ORDER BY id"
+GAME_BY_ID_QUERY = "SELECT * FROM games WHERE id = %s"
+GAME_STATUS_QUERY = "UPDATE games SET is_enabled = %s WHERE id = %s"
+
+def _load_game_registry():
+    games = execute_query(GAMES_QUERY, fetch=True, primary=True)
+    if games is None:
+        return None
+    return {
+        'all': games,
+        'enabled': [game for game in games if game['is_enabled'] == 1],
+        'by_name': {game['name']: game for game in games},
+    }
+
+def get_game_registry():
+    """Get the cached game catalog ({'all', 'enabled', 'by_name'})"""
+    registry = game_cache.get_or_load('registry', _load_game_registry)
+    return registry or {'all': [], 'enabled': [], 'by_name': {}}
 
 def get_all_games():
-    """Get all games from database"""
-    query = "SELECT * FROM games ORDER BY id"
-    return execute_query(query, fetch=True)
+    """Get all games"""
+    return get_game_registry()['all']
 
 def get_enabled_games():
     """Get only enabled games"""
-    query = "SELECT * FROM games WHERE is_enabled = 1 ORDER BY id"
-    return execute_query(query, fetch=True)
+    return get_game_registry()['enabled']
 
 def get_game_by_id(game_id):
     """Get game by ID"""
-    query = "SELECT * FROM games WHERE id = %s"
-    return execute_one(query, (game_id,))
+    return execute_one(GAME_BY_ID_QUERY, (game_id,))
 
 def get_game_by_name(game_name):
     """Get game by name"""
-    query = "SELECT * FROM games WHERE name = %s"
-    return execute_one(query, (game_name,))
+    return get_game_registry()['by_name'].get(game_name)
+
+def get_enabled_game(game_name):
+    """Get a game by name if it exists and is enabled, else None"""
+    game = get_game_by_name(game_name)
+    if game and game['is_enabled'] == 1:
+        return game
+    return None
 
 def toggle_game_status(game_id):
     """Toggle game enabled/disabled status"""
     game = get_game_by_id(game_id)
     if game:
         new_status = 0 if game['is_enabled'] == 1 else 1
-        query = "UPDATE games SET is_enabled = %s WHERE id = %s"
-        execute_query(query, (new_status, game_id))
+        execute_query(GAME_STATUS_QUERY, (new_status, game_id))
+        game_cache.invalidate()
         return new_status
     return None
@@ -1,16 +1,32 @@
 # routes/admin.py - Admin Routes
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app, jsonify
 from functools import wraps
 import models
+import database
+from utils.cache import cache_stats
+from utils.cleanup import purge_stats
+from utils.rate_limit import rate_limit_stats
+from utils.otp_store import otp_stats
+from utils.outbox import outbox_stats
+from utils.email_helper import smtp_pool
+from utils.http_cache import invalidate_page_cache
+from utils.static_assets import static_stats
+from utils import images
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
-import time
-from config import Image_EXTENSIONS as ALLOWED_EXTENSIONS
+from config import Image_EXTENSIONS as ALLOWED_EXTENSIONS, USERS_PAGE_SIZE, PROFILE_IMAGE_CONFIG
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@admin_bp.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Upload bigger than MAX_CONTENT_LENGTH (stopped while streaming)"""
+    flash(f"Image is too large! The limit is {PROFILE_IMAGE_CONFIG['max_upload_mb']} MB.", 'error')
+    return redirect(url_for('admin.admin_content'))
+
 # ============ DECORATORS ============
 
 def admin_required(f):
@@ -30,17 +46,24 @@ def admin_required(f):
 @admin_required
 def admin_dashboard():
     """Admin dashboard"""
-    users = models.get_all_users()
+    users = models.get_recent_users(5)
+    stats = models.get_user_stats()
     user = models.get_user_by_id(session.get('user_id'))
-    return render_template('admin_dashboard.html', users=users, user=user)
+    return render_template('admin_dashboard.html', users=users, user=user, stats=stats)
 
 @admin_bp.route('/users')
 @admin_required
 def admin_users():
     """Admin users management"""
-    active_users = models.get_active_users()
-    inactive_users = models.get_inactive_users()
-    return render_template('admin_users.html', active_users=active_users, inactive_users=inactive_users)
+    per_page = request.args.get('per_page', type=int)  # kept in the paging links
+    active_before = request.args.get('active_before', type=int)
+    inactive_before = request.args.get('inactive_before', type=int)
+    page_size = per_page or USERS_PAGE_SIZE
+    active_users, next_active = models.get_users_page(True, active_before, page_size)
+    inactive_users, next_inactive = models.get_users_page(False, inactive_before, page_size)
+    return render_template('admin_users.html', active_users=active_users, inactive_users=inactive_users,
+                           active_before=active_before, inactive_before=inactive_before,
+                           next_active=next_active, next_inactive=next_inactive, per_page=per_page)
 
 @admin_bp.route('/add-user', methods=['GET', 'POST'])
 @admin_required
@@ -169,17 +192,15 @@ def admin_toggle_user(user_id):
 def admin_content():
     """Admin edit homepage content"""
     if request.method == 'POST':
-        models.update_site_content('site_title', request.form.get('site_title', ''))
-        models.update_site_content('tagline', request.form.get('tagline', ''))
-        models.update_site_content('about_me', request.form.get('about_me', ''))
-        models.update_site_content('dream_job_title', request.form.get('dream_job_title', ''))
-        models.update_site_content('dream_job_text', request.form.get('dream_job_text', ''))
+        keys = ['site_title', 'tagline', 'about_me', 'dream_job_title', 'dream_job_text']
+        models.update_site_contents((key, request.form.get(key, '')) for key in keys)
+        invalidate_page_cache()
         
         flash('Homepage content updated successfully!', 'success')
         return redirect(url_for('admin.admin_content'))
     
     content = models.get_site_content()
-    return render_template('admin_content.html', content=content, now=int(time.time()))
+    return render_template('admin_content.html', content=content)
 
 @admin_bp.route('/game-config')
 @admin_required
@@ -200,6 +221,24 @@ def toggle_game(game_id):
         flash('Game not found!', 'error')
     return redirect(url_for('admin.game_config'))
 
+@admin_bp.route('/metrics')
+@admin_required
+def admin_metrics():
+    """Admin runtime metrics (JSON) for capacity planning"""
+    return jsonify({
+        'db_pool': database.get_pool_stats(),
+        'db_statements': database.get_statement_stats(),
+        'db_replicas': database.get_replica_stats(),
+        'caches': cache_stats(),
+        'purge': purge_stats(),
+        'rate_limits': rate_limit_stats(),
+        'otp': otp_stats(),
+        'outbox': outbox_stats(),
+        'smtp': smtp_pool.stats(),
+        'static': static_stats(),
+        'images': images.image_stats(),
+    })
+
 @admin_bp.route('/upload-profile', methods=['POST'])
 @admin_required
 def admin_upload_profile():
@@ -219,10 +258,23 @@ def admin_upload_profile():
         if not os.path.exists(upload_folder):
             os.makedirs(upload_folder)
         
-        filepath = os.path.join(upload_folder, 'profile.png')
-        file.save(filepath)
+        max_mb = PROFILE_IMAGE_CONFIG['max_upload_mb']
+        try:
+            upload = images.save_upload(file.stream, upload_folder, max_mb * 1024 * 1024)
+        except images.UploadTooLarge:
+            flash(f'Image is too large! The limit is {max_mb} MB.', 'error')
+            return redirect(url_for('admin.admin_content'))
+        try:
+            images.check_image(upload)
+        except images.InvalidImage as err:
+            os.unlink(upload)
+            flash(f'Invalid image: {err}', 'error')
+            return redirect(url_for('admin.admin_content'))
         
-        flash('Profile image updated successfully!', 'success')
+        if images.queue_profile_image(upload, upload_folder):
+            flash('Profile image uploaded! The homepage shows it in a few seconds.', 'success')
+        else:
+            flash('Image processing is busy, please try again shortly.', 'error')
     else:
         flash('Invalid file type! Please use PNG, JPG, or JPEG.', 'error')
     
@@ -1,13 +1,30 @@
 # routes/auth.py - Authentication Routes
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+import os
 import models
-from utils.email_helper import generate_otp, send_otp_email
+from utils.email_helper import generate_otp, queue_otp_email
+from utils.rate_limit import RateLimiter
+from utils import otp_store, images
+from utils.http_cache import conditional_page, file_mtime
+from config import RATE_LIMITS
 
 auth_bp = Blueprint('auth', __name__)
 
+# OTP emails per address (spam prevention)
+otp_email_limiter = RateLimiter('otp_email', **RATE_LIMITS['otp_email'])
+
 # ============ PUBLIC ROUTES ============
 
+def _homepage_version():
+    """What the homepage shows: site content, admin profile row and profile image"""
+    content = models.get_site_content()
+    admin = models.get_admin_user()
+    profile_mtime = file_mtime('static', 'images', 'profile.png')
+    parts = (sorted(content.items()), sorted(admin.items()) if admin else None, profile_mtime)
+    return parts, [models.get_site_content_updated(), profile_mtime]
+
 @auth_bp.route('/')
+@conditional_page(_homepage_version, cache_anonymous=True)
 def index():
     """Homepage"""
     user = None
@@ -15,9 +32,12 @@ def index():
         user = models.get_user_by_id(session.get('user_id'))
     content = models.get_site_content()
     admin = models.get_admin_user()
-    return render_template('index.html', user=user, content=content, admin=admin)
+    sources = images.profile_sources(os.path.join(current_app.static_folder, 'images'))
+    return render_template('index.html', user=user, content=content, admin=admin,
+                           profile_sources=sources)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@conditional_page()
 def login():
     """Login page"""
     if session.get('loggedIn'):
@@ -65,6 +85,7 @@ def logout():
     return redirect(url_for('auth.login'))
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@conditional_page()
 def register():
     """Registration page"""
     if session.get('loggedIn'):
@@ -94,14 +115,19 @@ def register():
         if len(password) < 6:
             errors.append('Password must be at least 6 characters!')
         
-        if models.get_user_by_username(username):
-            errors.append('Username already exists!')
-        
-        if models.get_user_by_email(email):
-            errors.append('Email already registered!')
+        # Uniqueness checks (one query)
+        check = models.check_registration(username, email)
+        if check is None:
+            errors.append('Registration is unavailable right now. Please try again later.')
+        else:
+            if check['username_taken']:
+                errors.append('Username already exists!')
+            
+            if check['email_taken']:
+                errors.append('Email already registered!')
         
         # Check for spam
-        if models.check_email_spam(email):
+        if email and otp_email_limiter.is_limited(email.lower()):
             errors.append('Too many OTP requests. Please try again later.')
         
         if errors:
@@ -110,20 +136,25 @@ def register():
             return render_template('register.html')
         
         # Save pending registration
-        models.save_pending_registration(username, password, email, firstname, 
-                                         middlename, lastname, birthday, contact)
+        if not models.save_pending_registration(username, password, email, firstname, 
+                                                middlename, lastname, birthday, contact):
+            flash('Registration is unavailable right now. Please try again later.', 'error')
+            return render_template('register.html')
         
         # Generate and save OTP
         otp = generate_otp()
-        models.save_otp(email, otp)
-        models.log_email_sent(email)
-        
-        # Send OTP email
-        send_otp_email(email, otp)
+        otp_store.save_otp(email, otp)
         
         # Store email in session for verification
         session['pending_email'] = email
         
+        # Queue OTP email (sent in the background); only a queued email counts
+        # against the rate limit
+        if not queue_otp_email(email, otp):
+            flash('We could not send your OTP right now. Please use Resend OTP in a moment.', 'error')
+            return redirect(url_for('auth.verify_otp'))
+        otp_email_limiter.hit(email.lower())
+        
         flash('OTP has been sent to your email!', 'success')
         return redirect(url_for('auth.verify_otp'))
     
@@ -140,9 +171,15 @@ def verify_otp():
         otp_code = request.form.get('otp')
         email = session.get('pending_email')
         
-        if models.verify_otp(email, otp_code):
-            # Complete registration
-            models.complete_registration(email)
+        # The account is created before the OTP is consumed, so a database
+        # error leaves the code valid for another try. Promotion itself is
+        # single-use: it deletes the pending row and users are unique.
+        if otp_store.check_otp(email, otp_code):
+            if not models.complete_registration(email):
+                flash('Registration could not be completed. Please try again, or register again '
+                      'if this keeps happening.', 'error')
+                return render_template('verify_otp.html', email=email)
+            otp_store.verify_otp(email, otp_code)
             session.pop('pending_email', None)
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('auth.login'))
@@ -160,15 +197,17 @@ def resend_otp():
         return redirect(url_for('auth.register'))
     
     # Check spam
-    if models.check_email_spam(email):
+    if otp_email_limiter.is_limited(email.lower()):
         flash('Too many OTP requests. Please try again later.', 'error')
         return redirect(url_for('auth.verify_otp'))
     
     # Generate new OTP
     otp = generate_otp()
-    models.save_otp(email, otp)
-    models.log_email_sent(email)
-    send_otp_email(email, otp)
+    otp_store.save_otp(email, otp)
+    if not queue_otp_email(email, otp):
+        flash('We could not send your OTP right now. Please try again in a moment.', 'error')
+        return redirect(url_for('auth.verify_otp'))
+    otp_email_limiter.hit(email.lower())
     
     flash('New OTP has been sent!', 'success')
     return redirect(url_for('auth.verify_otp'))
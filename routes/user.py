@@ -76,14 +76,7 @@ def games():
 @login_required
 def play_game(game):
     """Launch the selected game"""
-    game_obj = models.get_game_by_id(game)  # Assuming game is id, but wait, it's name
-    # Actually, the url is /play/tic_tac_toe, so game is the name
-    # Need to get game by name
-    # Add function to get by name
-    # For now, check if enabled by finding the game
-    games = models.get_enabled_games()
-    game_names = [g['name'] for g in games]
-    if game in game_names:
+    if models.get_enabled_game(game):
         game_files = {
             'tic_tac_toe': 'tic_tac_toe.py',
             'rock_paper_scissors': 'rock_paper_scissors.py',
@@ -0,0 +1,118 @@
+# cache.py - In-Process Caches
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+_caches = []
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after `ttl` seconds.
+
+    Every invalidate() bumps a generation counter, so a value loaded from the
+    database while an invalidation happened is not stored (no stale writes).
+    """
+
+    def __init__(self, name, ttl=300):
+        self.name = name
+        self.ttl = ttl
+        self._data = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        _caches.append(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, calling loader() on a miss (None is not cached)"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self._generation
+        value = loader()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    @property
+    def generation(self):
+        """Pass to set() to skip storing a value loaded before an invalidation"""
+        return self._generation
+
+    def invalidate(self, *keys):
+        """Drop the given keys (all keys if none given)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if keys:
+                for key in keys:
+                    self._data.pop(key, None)
+            else:
+                self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+class LRUCache(TTLCache):
+    """TTLCache holding at most `maxsize` entries; the least recently used go first"""
+
+    def __init__(self, name, ttl=300, maxsize=1024):
+        super().__init__(name, ttl)
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(maxsize=self.maxsize, evictions=self.evictions)
+        return stats
+
+def cache_stats():
+    """Hit/miss counters of every cache in this process"""
+    return {cache.name: cache.stats() for cache in _caches}
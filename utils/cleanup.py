@@ -0,0 +1,121 @@
+# cleanup.py - Background Purge of Expired Rows
+import os
+import threading
+import time
+from config import PURGE_CONFIG
+from database import DatabaseError, DatabaseUnavailable
+
+class PurgeWorker:
+    """Daemon thread that periodically deletes expired OTPs, email log entries
+    and abandoned registrations in small batches (see PURGE_CONFIG).
+
+    Every batch is its own short transaction, so a large backlog never holds
+    locks for long; a run stops after `max_batches` per table and leaves the
+    rest for the next run.
+    """
+
+    def __init__(self, interval=600, batch_size=500, max_batches=100, batch_pause=0.05,
+                 retention_minutes=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.batch_pause = batch_pause
+        self.retention_minutes = retention_minutes or {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.failed_runs = 0
+        self.total_purged = {table: 0 for table in self.retention_minutes}
+        self.last_run = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='purge-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        """Purge every table once; returns {table: rows deleted}"""
+        import models
+
+        started = time.time()
+        purged = {}
+        error = None
+        for table, minutes in self.retention_minutes.items():
+            purged[table] = 0
+            try:
+                for _ in range(self.max_batches):
+                    deleted = models.purge_expired_rows(table, minutes, self.batch_size)
+                    purged[table] += deleted
+                    if deleted < self.batch_size or self._stop.is_set():
+                        break
+                    time.sleep(self.batch_pause)
+            except (DatabaseError, DatabaseUnavailable) as err:
+                print(f"Purge Error ({table}): {err}")
+                error = str(err)
+        with self._lock:
+            self.runs += 1
+            if error:
+                self.failed_runs += 1
+            for table, count in purged.items():
+                self.total_purged[table] = self.total_purged.get(table, 0) + count
+            self.last_run = {
+                'started_at': started,
+                'duration_ms': round((time.time() - started) * 1000, 2),
+                'purged': purged,
+                'error': error,
+            }
+        return purged
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'interval': self.interval,
+                'runs': self.runs,
+                'failed_runs': self.failed_runs,
+                'total_purged': dict(self.total_purged),
+                'last_run': self.last_run,
+            }
+
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+def get_purge_worker():
+    """Return this process's purge worker (a new one after a fork)"""
+    global _worker, _worker_pid
+    if _worker is None or _worker_pid != os.getpid():
+        with _worker_lock:
+            if _worker is None or _worker_pid != os.getpid():
+                _worker = PurgeWorker(**{key: value for key, value in PURGE_CONFIG.items()
+                                         if key != 'enabled'})
+                _worker_pid = os.getpid()
+    return _worker
+
+def purge_stats():
+    """Counters of the purge worker (rows purged per table, last run)"""
+    return get_purge_worker().stats()
+
+def init_app(app):
+    """Start the purge worker with the first request of each worker process.
+
+    Starting lazily (rather than at import) keeps the thread out of the
+    reloader's watcher process and restarts it in forked workers.
+    """
+    if not PURGE_CONFIG['enabled']:
+        return
+
+    @app.before_request
+    def start_purge_worker():
+        get_purge_worker().start()
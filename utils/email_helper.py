@@ -1,29 +1,35 @@
 # email_helper.py - Email Sending Helper
-import smtplib
 import random
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from config import EMAIL_CONFIG
+from config import EMAIL_CONFIG, OUTBOX_CONFIG, SMTP_POOL_CONFIG
+from utils.outbox import create_outbox
+from utils.smtp_pool import SMTPPool
+
+# Logged-in SMTP connections reused across messages
+smtp_pool = SMTPPool(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'],
+                     EMAIL_CONFIG['email'], EMAIL_CONFIG['password'], **SMTP_POOL_CONFIG)
+
+# OTP emails are delivered in the background so requests never wait on SMTP
+email_outbox = create_outbox('email', **OUTBOX_CONFIG)
 
 def generate_otp():
     """Generate a 6-digit OTP"""
     return str(random.randint(100000, 999999))
 
-def send_otp_email(to_email, otp_code):
-    """Send OTP to user's email"""
-    # # Print OTP to console for testing (remove in production)
-    # print(f"\n{'='*50}")
-    # print(f"OTP Code for {to_email}: {otp_code}")
-    # print(f"{'='*50}\n")
+def queue_otp_email(to_email, otp_code):
+    """Queue the OTP email for background delivery (returns False if the queue is full)"""
+    return email_outbox.enqueue(send_otp_email, to_email, otp_code,
+                                description=f"OTP email to {to_email}")
+
+def build_otp_email(to_email, otp_code):
+    """Create the OTP email message"""
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_CONFIG['email']
+    msg['To'] = to_email
+    msg['Subject'] = 'Your OTP Code - Flask Blog'
     
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['email']
-        msg['To'] = to_email
-        msg['Subject'] = 'Your OTP Code - Flask Blog'
-        
-        body = f"""
+    body = f"""
         Hello!
         
         Your OTP code for registration is: {otp_code}
@@ -35,19 +41,20 @@ def send_otp_email(to_email, otp_code):
         Best regards,
         Flask Blog Team
         """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Connect and send
-        server = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
-        server.starttls()
-        server.login(EMAIL_CONFIG['email'], EMAIL_CONFIG['password'])
-        server.send_message(msg)
-        server.quit()
-        
+    
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def send_otp_email(to_email, otp_code):
+    """Send OTP to user's email (blocking; requests use queue_otp_email)"""
+    # # Print OTP to console for testing (remove in production)
+    # print(f"\n{'='*50}")
+    # print(f"OTP Code for {to_email}: {otp_code}")
+    # print(f"{'='*50}\n")
+    
+    try:
+        smtp_pool.send(build_otp_email(to_email, otp_code))
         return True
     except Exception as e:
         print(f"Email Error: {e}")
-        # For demo purposes, return True even if email fails
-        # In production, you should handle this properly
-        return False  # Change to False in production
+        return False
@@ -0,0 +1,114 @@
+# http_cache.py - Conditional GET (ETag / Last-Modified) for Mostly-Static Pages
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+from utils.cache import LRUCache
+from config import PAGE_CACHE_TTL, PAGE_CACHE_SIZE
+
+_templates_version = None
+
+# (path, logged in, ETag) -> (body, mimetype) of pages rendered for anonymous visitors
+page_cache = LRUCache('pages', ttl=PAGE_CACHE_TTL, maxsize=PAGE_CACHE_SIZE)
+
+def invalidate_page_cache():
+    """Drop every cached page (call after saving content the pages show)"""
+    page_cache.invalidate()
+
+def templates_version():
+    """Newest modification time of the templates and stylesheets (changes with a deploy)"""
+    global _templates_version
+    if _templates_version is None or current_app.debug:
+        # Pages embed the stylesheet's content-hashed URL (utils/static_assets.py)
+        folders = [os.path.join(current_app.root_path, current_app.template_folder),
+                   os.path.join(current_app.static_folder, 'css')]
+        newest = 0
+        for folder in folders:
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+        _templates_version = newest
+    return _templates_version
+
+def file_mtime(*parts):
+    """Modification time of a file under the app root (0 if it does not exist)"""
+    try:
+        return os.path.getmtime(os.path.join(current_app.root_path, *parts))
+    except OSError:
+        return 0
+
+def _session_state():
+    # What the shared layout shows differently per visitor (navbar links)
+    return (bool(session.get('loggedIn')), session.get('role'), session.get('user_id'))
+
+def _to_datetime(value):
+    if value is None or value == 0:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(int(value), timezone.utc)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # database times are UTC
+    return value.replace(microsecond=0)
+
+def _render(view, args, kwargs, key):
+    # Logged-out visitors all get the same HTML for a given version: serve it from memory
+    if key is None:
+        return make_response(view(*args, **kwargs))
+    cached = page_cache.get(key)
+    if cached is not None:
+        body, mimetype = cached
+        return current_app.response_class(body, mimetype=mimetype)
+    generation = page_cache.generation
+    response = make_response(view(*args, **kwargs))
+    if response.status_code == 200 and not response.direct_passthrough and not session.get('_flashes'):
+        page_cache.set(key, (response.get_data(), response.mimetype), generation)
+    return response
+
+def conditional_page(validator=None, cache_anonymous=False):
+    """Answer repeat GETs of a page with 304 Not Modified while it is unchanged.
+
+    `validator()` returns (version_parts, change_times): anything the page
+    content depends on, plus the change times of its sources (datetimes,
+    timestamps or None; the newest becomes Last-Modified). The ETag is a
+    hash of those parts, the templates version and the visitor's session
+    state, so it is computed without rendering. Responses carrying flash
+    messages are never cached or answered with 304.
+
+    With `cache_anonymous`, the rendered page is also kept in `page_cache`
+    for logged-out visitors, keyed on (path, logged-in flag, ETag), so they
+    are served without running the view at all.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            parts, change_times = validator() if validator else ((), [])
+            stamps = [_to_datetime(value) for value in [*change_times, templates_version()]]
+            stamps = [stamp for stamp in stamps if stamp is not None]
+            last_modified = max(stamps) if stamps else None
+            state = _session_state()
+            digest = hashlib.sha1(repr((parts, templates_version(), state)).encode())
+            etag = digest.hexdigest()[:20]
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response('', 304)
+            else:
+                key = (request.path, False, etag) if cache_anonymous and not state[0] else None
+                response = _render(view, args, kwargs, key)
+                if response.status_code != 200 or session.get('_flashes'):
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Always revalidate; only shared caches may keep anonymous pages
+            response.headers['Cache-Control'] = 'private, no-cache' if state[0] else 'public, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,170 @@
+# images.py - Profile Image Processing
+import os
+import re
+import tempfile
+import threading
+from config import PROFILE_IMAGE_CONFIG
+from utils.http_cache import invalidate_page_cache
+from utils.outbox import create_outbox
+
+try:
+    from PIL import Image, ImageOps  # optional (pip install pillow)
+except ImportError:
+    Image = None
+
+# Uploads are streamed to a temporary file, checked, and handed to a
+# background thread that writes profile-<width>.webp variants plus
+# profile.png (the largest variant, for browsers without WebP). Every file
+# is written to a temporary name and renamed, so visitors never get a
+# half-written image; profile.png goes last, so its change marks the update.
+
+PROFILE_FALLBACK = 'profile.png'
+_VARIANT = re.compile(r'^profile-(\d+)\.webp$')
+_SIGNATURES = {b'\x89PNG\r\n\x1a\n': 'PNG', b'\xff\xd8\xff': 'JPEG'}
+
+# Failed images are not retried: the upload is gone and the admin can try again
+image_outbox = create_outbox('images', workers=1, max_queue=10, max_attempts=1)
+
+_sources = {}  # folder -> (profile.png mtime, [(width, filename), ...])
+_stats = {'uploaded': 0, 'processed': 0, 'rejected': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+class UploadTooLarge(Exception):
+    """The upload is bigger than PROFILE_IMAGE_CONFIG['max_upload_mb']"""
+
+class InvalidImage(Exception):
+    """The upload is not a PNG or JPEG image we can use"""
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def save_upload(stream, folder, max_bytes):
+    """Copy an uploaded file to a temporary file in `folder` in chunks, stopping at max_bytes"""
+    fd, path = tempfile.mkstemp(dir=folder, prefix='.upload-', suffix='.tmp')
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(65536), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    _count('rejected')
+                    raise UploadTooLarge()
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+def check_image(path):
+    """Return the real format of an upload ('PNG' or 'JPEG'); raises InvalidImage"""
+    try:
+        return _check_image(path)
+    except InvalidImage:
+        _count('rejected')
+        raise
+
+def _check_image(path):
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    image_format = next((name for signature, name in _SIGNATURES.items()
+                         if head.startswith(signature)), None)
+    if image_format is None:
+        raise InvalidImage('not a PNG or JPEG file')
+    if Image is not None:
+        # Only reads the header: cheap enough for the request thread
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+        except Exception:
+            raise InvalidImage('the file cannot be decoded')
+        if width * height > PROFILE_IMAGE_CONFIG['max_pixels']:
+            raise InvalidImage(f'{width}x{height} pixels is too large')
+    return image_format
+
+def _save_atomic(image, path, image_format, **params):
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        image.save(temp, format=image_format, **params)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+
+def _write_variants(upload, folder):
+    with Image.open(upload) as original:
+        image = ImageOps.exif_transpose(original)  # phone photos are stored sideways
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    # Never upscale: widths beyond the original collapse into the original width
+    widths = sorted({min(width, image.width) for width in PROFILE_IMAGE_CONFIG['widths']})
+    variant = image
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        variant = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        _save_atomic(variant, os.path.join(folder, f"profile-{width}.webp"), 'WEBP',
+                     quality=PROFILE_IMAGE_CONFIG['webp_quality'], method=6)
+    _remove_variants(folder, keep=widths)  # left over from a larger image
+    _save_atomic(variant, os.path.join(folder, PROFILE_FALLBACK), 'PNG', optimize=True)
+
+def _remove_variants(folder, keep=()):
+    # Must run before profile.png is replaced: profile_sources() caches the
+    # listing it sees under the new profile.png mtime
+    for name in os.listdir(folder):
+        match = _VARIANT.match(name)
+        if match and int(match.group(1)) not in keep:
+            os.unlink(os.path.join(folder, name))
+
+def process_profile_image(upload, folder):
+    """Replace the profile image with an upload (run by the image outbox)"""
+    try:
+        if Image is None:
+            # Without Pillow the checked upload is used as it is, and
+            # variants of an earlier image must not outlive it
+            _remove_variants(folder)
+            os.replace(upload, os.path.join(folder, PROFILE_FALLBACK))
+        else:
+            _write_variants(upload, folder)
+    except Exception as err:
+        _count('failed')
+        print(f"Image Error: {err}")
+        return False
+    finally:
+        if os.path.exists(upload):
+            os.unlink(upload)
+    _count('processed')
+    invalidate_page_cache()
+    return True
+
+def queue_profile_image(upload, folder):
+    """Process an uploaded (and checked) file in the background; False if the queue is full"""
+    _count('uploaded')
+    queued = image_outbox.enqueue(process_profile_image, upload, folder,
+                                  description='profile image')
+    if not queued:
+        os.unlink(upload)
+    return queued
+
+def profile_sources(folder):
+    """(width, filename) of the WebP profile variants, smallest first, for srcset"""
+    try:
+        version = os.path.getmtime(os.path.join(folder, PROFILE_FALLBACK))
+    except OSError:
+        return []
+    cached = _sources.get(folder)
+    if cached and cached[0] == version:
+        return cached[1]
+    sources = []
+    for name in os.listdir(folder):
+        match = _VARIANT.match(name)
+        if match:
+            sources.append((int(match.group(1)), name))
+    sources.sort()
+    _sources[folder] = (version, sources)
+    return sources
+
+def image_stats():
+    with _stats_lock:
+        return dict(_stats, pillow=Image is not None)
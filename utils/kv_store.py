@@ -0,0 +1,361 @@
+# kv_store.py - Key-Value Store for Short-Lived Data (rate limits, OTPs)
+import hmac
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from config import KV_STORE_CONFIG
+
+_forked = False
+
+def _after_fork():
+    global _forked
+    _forked = True
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def _multi_process_hint():
+    """Why this process is probably one of several workers (None if there is no sign of it)"""
+    if _forked:
+        return 'the process was forked after the app was loaded'
+    if int(os.getenv('WEB_CONCURRENCY') or 1) > 1:
+        return f"WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY')}"
+    server = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if server in ('gunicorn', 'uwsgi', 'waitress-serve'):
+        return f'running under {server}'
+    return None
+
+class MemoryStore:
+    """In-process store: fine for one worker process or development.
+
+    Each worker keeps its own data, so with several workers an OTP issued by
+    one is unknown to the others: use SQLiteStore or RedisStore there.
+    """
+
+    name = 'memory'
+
+    def __init__(self, sweep_interval=60):
+        self._values = {}   # key -> (value, expires_at)
+        self._windows = {}  # key -> (deque of hit times, window seconds)
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._warned = False
+
+    def _check_process(self):
+        # Called on every write; only the first sign of several processes is reported
+        if self._warned:
+            return
+        hint = _multi_process_hint()
+        if hint:
+            self._warned = True
+            print(f"KV Store Warning: kv_backend=memory keeps OTPs and rate limits per process "
+                  f"({hint}); with more than one worker, codes issued by one are rejected by "
+                  f"the others. Use kv_backend=sqlite (one host) or kv_backend=redis.")
+
+    # ---- values with expiry ----
+
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds (replacing any older value)"""
+        self._check_process()
+        with self._lock:
+            now = time.monotonic()
+            self._values[key] = (value, now + ttl)
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def compare_and_delete(self, key, expected):
+        """Atomically delete key if it holds `expected`; True if it did"""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return False
+            if not hmac.compare_digest(str(entry[0]), str(expected)):
+                return False
+            del self._values[key]
+            return True
+
+    # ---- sliding windows ----
+
+    def window_full(self, key, limit, window):
+        """True if `limit` hits were recorded for key in the last `window` seconds"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                return False
+            hits = entry[0]
+            # The deque keeps only the newest `limit` hits, oldest first
+            return len(hits) >= limit and hits[0] > now - window
+
+    def window_add(self, key, limit, window):
+        """Record a hit for key"""
+        self._check_process()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or entry[0].maxlen != limit:
+                entry = (deque(entry[0] if entry else (), maxlen=limit), window)
+                self._windows[key] = entry
+            entry[0].append(now)
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def _sweep(self, now):
+        # Forget expired values and keys whose newest hit has left its window
+        for key in [key for key, (_, expires_at) in self._values.items() if expires_at <= now]:
+            del self._values[key]
+        expired = [key for key, (hits, window) in self._windows.items()
+                   if not hits or hits[-1] <= now - window]
+        for key in expired:
+            del self._windows[key]
+        self._next_sweep = now + self._sweep_interval
+
+    def stats(self):
+        with self._lock:
+            return {'backend': self.name, 'values': len(self._values),
+                    'windows': len(self._windows)}
+
+
+class SQLiteStore:
+    """Store shared by every worker process on one host, in an SQLite file.
+
+    Needs no extra service; workers on several hosts need RedisStore.
+    """
+
+    name = 'sqlite'
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv_values (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS kv_hits (
+            key TEXT NOT NULL,
+            hit_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_kv_hits_key ON kv_hits (key, hit_at);
+    """
+
+    def __init__(self, path, prefix='flask_app:', sweep_interval=60, timeout=5):
+        self.path = path
+        self.prefix = prefix
+        self._timeout = timeout
+        self._local = threading.local()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        _create_private(path)
+        self._connect().executescript(self._SCHEMA)
+
+    def _connect(self):
+        # One connection per thread, reopened in a forked child
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, statements):
+        """Run (query, params) pairs in one write transaction"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for query, params in statements:
+                conn.execute(query, params)
+            if now >= self._next_sweep:
+                self._sweep(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    # ---- values with expiry ----
+
+    def set(self, key, value, ttl):
+        self._write([("INSERT OR REPLACE INTO kv_values (key, value, expires_at) VALUES (?, ?, ?)",
+                      (self.prefix + key, str(value), time.time() + ttl))])
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM kv_values WHERE key = ? AND expires_at > ?",
+            (self.prefix + key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def delete(self, key):
+        self._write([("DELETE FROM kv_values WHERE key = ?", (self.prefix + key,))])
+
+    def compare_and_delete(self, key, expected):
+        key = self.prefix + key
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock first, so two workers cannot
+        # both read the code before either deletes it
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT value FROM kv_values WHERE key = ? AND expires_at > ?",
+                               (key, time.time())).fetchone()
+            matched = row is not None and hmac.compare_digest(str(row[0]), str(expected))
+            if matched:
+                conn.execute("DELETE FROM kv_values WHERE key = ?", (key,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return matched
+
+    # ---- sliding windows (one row per hit) ----
+
+    def window_full(self, key, limit, window):
+        key = self.prefix + key
+        (count,) = self._connect().execute(
+            "SELECT COUNT(*) FROM kv_hits WHERE key = ? AND hit_at > ?",
+            (key, time.time() - window)).fetchone()
+        return count >= limit
+
+    def window_add(self, key, limit, window):
+        key = self.prefix + key
+        now = time.time()
+        self._write([
+            ("INSERT INTO kv_hits (key, hit_at, expires_at) VALUES (?, ?, ?)",
+             (key, now, now + window)),
+            # keep the newest `limit` hits
+            ("DELETE FROM kv_hits WHERE key = ? AND rowid NOT IN "
+             "(SELECT rowid FROM kv_hits WHERE key = ? ORDER BY hit_at DESC LIMIT ?)",
+             (key, key, limit)),
+        ])
+
+    def _sweep(self, conn, now):
+        conn.execute("DELETE FROM kv_values WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM kv_hits WHERE expires_at <= ?", (now,))
+        self._next_sweep = now + self._sweep_interval
+
+    def stats(self):
+        conn = self._connect()
+        now = time.time()
+        # Only this app's keys: other apps may use the same file with another prefix
+        mine = "substr(key, 1, ?) = ?"
+        scope = (len(self.prefix), self.prefix, now)
+        (values,) = conn.execute(f"SELECT COUNT(*) FROM kv_values WHERE {mine} AND expires_at > ?",
+                                 scope).fetchone()
+        (windows,) = conn.execute(f"SELECT COUNT(DISTINCT key) FROM kv_hits WHERE {mine} "
+                                  "AND expires_at > ?", scope).fetchone()
+        return {'backend': self.name, 'path': self.path, 'values': values, 'windows': windows}
+
+def _create_private(path):
+    """Create the store file (and its folder) readable and writable by this user only.
+
+    The file holds live OTPs: refuse one that another user owns, since they
+    could read codes or reset rate limits.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        info = os.fstat(fd)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{path} is owned by another user (uid {info.st_uid})")
+        if info.st_mode & 0o077:
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+class RedisStore:
+    """Store shared by every worker, on Redis or any server speaking its protocol.
+
+    Needs the optional `redis` package (pip install redis).
+    """
+
+    name = 'redis'
+
+    # Delete the key only if it still holds the expected value (one round trip, atomic)
+    _COMPARE_AND_DELETE = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url, prefix='flask_app:'):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._compare_and_delete = self._redis.register_script(self._COMPARE_AND_DELETE)
+
+    # ---- values with expiry ----
+
+    def set(self, key, value, ttl):
+        self._redis.set(self.prefix + key, value, ex=int(ttl))
+
+    def get(self, key):
+        value = self._redis.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def delete(self, key):
+        self._redis.delete(self.prefix + key)
+
+    def compare_and_delete(self, key, expected):
+        return bool(self._compare_and_delete(keys=[self.prefix + key], args=[expected]))
+
+    # ---- sliding windows (sorted set of hit times) ----
+
+    def window_full(self, key, limit, window):
+        key = self.prefix + key
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now - window)
+        pipe.zcard(key)
+        _, count = pipe.execute()
+        return count >= limit
+
+    def window_add(self, key, limit, window):
+        key = self.prefix + key
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zadd(key, {f"{now}:{uuid.uuid4().hex}": now})
+        pipe.zremrangebyrank(key, 0, -limit - 1)  # keep the newest `limit` hits
+        pipe.expire(key, int(window) + 1)
+        pipe.execute()
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the configured store (KV_STORE_CONFIG['backend']: 'sqlite', 'memory' or 'redis')"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(KV_STORE_CONFIG['backend'])
+    return _store
+
+def create_store(name):
+    if name == 'memory':
+        return MemoryStore()
+    if name == 'sqlite':
+        return SQLiteStore(KV_STORE_CONFIG['path'], KV_STORE_CONFIG['prefix'])
+    if name == 'redis':
+        return RedisStore(KV_STORE_CONFIG['redis_url'], KV_STORE_CONFIG['prefix'])
+    raise ValueError(f"Unknown key-value store: {name!r}")
@@ -0,0 +1,46 @@
+# otp_store.py - One-Time Password Storage
+import hmac
+import threading
+from config import OTP_EXPIRY_MINUTES
+from utils.kv_store import get_store
+
+# OTPs live in the key-value store (utils/kv_store.py) and expire there on
+# their own, so issuing and checking codes never touches the database.
+
+_stats = {'saved': 0, 'verified': 0, 'rejected': 0}
+_stats_lock = threading.Lock()
+
+def _key(email):
+    return f"otp:{email.lower()}"
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def save_otp(email, otp_code):
+    """Store the OTP for this email (replaces any older one), valid for OTP_EXPIRY_MINUTES"""
+    get_store().set(_key(email), otp_code, OTP_EXPIRY_MINUTES * 60)
+    _count('saved')
+
+def check_otp(email, otp_code):
+    """True if otp_code is the current, unexpired code for this email (does not consume it)"""
+    if not email or not otp_code:
+        return False
+    stored = get_store().get(_key(email))
+    return stored is not None and hmac.compare_digest(str(stored), str(otp_code))
+
+def verify_otp(email, otp_code):
+    """Check the OTP and consume it in one atomic step.
+
+    Returns True only for the first request presenting the right, unexpired
+    code; concurrent requests cannot both succeed.
+    """
+    if not email or not otp_code:
+        return False
+    verified = get_store().compare_and_delete(_key(email), otp_code)
+    _count('verified' if verified else 'rejected')
+    return verified
+
+def otp_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,176 @@
+# outbox.py - Background Delivery Queue (emails)
+import atexit
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+class Outbox:
+    """Queue of deliveries handled by a small pool of background threads.
+
+    Requests call enqueue() and return at once; a worker calls the send
+    function, and when it fails (returns False or raises) the message is
+    retried with exponential backoff up to `max_attempts` times. Workers are
+    started with the first message of each process (so forked servers get
+    their own).
+    """
+
+    def __init__(self, name, workers=2, max_queue=1000, max_attempts=4,
+                 backoff_base=2.0, backoff_max=60.0):
+        self.name = name
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=200)  # enqueue -> delivered, seconds
+        self._retrying = 0
+        self.enqueued = 0
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def enqueue(self, send, *args, description=''):
+        """Queue send(*args) for delivery; False if the queue is full"""
+        self._ensure_started()
+        message = {'send': send, 'args': args, 'description': description,
+                   'queued_at': time.time(), 'attempts': 0}
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print(f"Outbox Error ({self.name}): queue full, dropped {description}")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    @property
+    def started(self):
+        """True once this process has started its worker threads"""
+        return self._pid == os.getpid()
+
+    def _ensure_started(self):
+        if self.started:
+            return
+        with self._lock:
+            if self.started:
+                return
+            if self._pid is not None:
+                # Forked from a process that had started: its queue and
+                # threads belong to the parent
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f"outbox-{self.name}-{index}")
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            message = self._queue.get()
+            try:
+                self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, message):
+        message['attempts'] += 1
+        try:
+            ok = message['send'](*message['args'])
+            error = None if ok else 'send returned False'
+        except Exception as err:
+            ok, error = False, str(err)
+
+        if ok:
+            with self._lock:
+                self.delivered += 1
+                self._latencies.append(time.time() - message['queued_at'])
+            return
+
+        with self._lock:
+            self.last_error = error
+        if message['attempts'] >= self.max_attempts:
+            with self._lock:
+                self.failed += 1
+            print(f"Outbox Error ({self.name}): giving up on {message['description']} "
+                  f"after {message['attempts']} attempts: {error}")
+            return
+        # Retry later without holding a worker while waiting
+        delay = min(self.backoff_max, self.backoff_base ** message['attempts'])
+        with self._lock:
+            self.retries += 1
+            self._retrying += 1
+        timer = threading.Timer(delay, self._requeue, args=(message,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, message):
+        with self._lock:
+            self._retrying -= 1
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self.failed += 1
+            print(f"Outbox Error ({self.name}): queue full, dropped retry of {message['description']}")
+
+    def flush(self, timeout=5.0):
+        """Wait up to timeout seconds for queued messages to be delivered"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                retrying = self._retrying
+            if self._queue.unfinished_tasks == 0 and not retrying:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'workers': self.workers,
+                'depth': self._queue.qsize(),
+                'retrying': self._retrying,
+                'enqueued': self.enqueued,
+                'delivered': self.delivered,
+                'retries': self.retries,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'latency_avg_ms': _ms(sum(latencies) / len(latencies)) if latencies else None,
+                'latency_p95_ms': _ms(latencies[math.ceil(0.95 * len(latencies)) - 1]) if latencies else None,
+                'latency_max_ms': _ms(latencies[-1]) if latencies else None,
+                'last_error': self.last_error,
+            }
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+_outboxes = []
+
+def create_outbox(name, **config):
+    """Create an outbox that is flushed (briefly) when the process exits"""
+    outbox = Outbox(name, **config)
+    _outboxes.append(outbox)
+    return outbox
+
+def outbox_stats():
+    """Queue depth, delivery counts and latency of every outbox"""
+    return {outbox.name: outbox.stats() for outbox in _outboxes}
+
+@atexit.register
+def _flush_all():
+    for outbox in _outboxes:
+        if outbox.started:
+            outbox.flush(timeout=5.0)
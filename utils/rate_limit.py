@@ -0,0 +1,62 @@
+# rate_limit.py - Sliding-Window Rate Limits
+import threading
+from utils.kv_store import get_store
+
+_limiters = []
+
+class RateLimiter:
+    """At most `limit` events per key in any `window` seconds.
+
+    The check and the record are separate so a request can be refused during
+    validation but only counted once the limited action really happened.
+    Backed by the configured key-value store (utils/kv_store.py).
+    """
+
+    def __init__(self, name, limit, window, store=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._store = store
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.limited = 0
+        self.hits = 0
+        _limiters.append(self)
+
+    @property
+    def store(self):
+        return self._store or get_store()
+
+    def _key(self, key):
+        return f"rate:{self.name}:{key}"
+
+    def is_limited(self, key):
+        """True if key already used up its limit for the current window"""
+        limited = self.store.window_full(self._key(key), self.limit, self.window)
+        with self._lock:
+            self.checks += 1
+            if limited:
+                self.limited += 1
+        return limited
+
+    def hit(self, key):
+        """Count one event for key"""
+        self.store.window_add(self._key(key), self.limit, self.window)
+        with self._lock:
+            self.hits += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'window': self.window,
+                'checks': self.checks,
+                'limited': self.limited,
+                'hits': self.hits,
+            }
+
+def rate_limit_stats():
+    """Counters of every rate limiter plus the store they use"""
+    stats = {limiter.name: limiter.stats() for limiter in _limiters}
+    stats['store'] = get_store().stats()
+    return stats
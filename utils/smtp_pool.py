@@ -0,0 +1,195 @@
+# smtp_pool.py - Reusable Authenticated SMTP Connections
+import os
+import smtplib
+import threading
+import time
+
+class _Session:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """Keeps logged-in SMTP connections open between messages.
+
+    Connecting, STARTTLS and AUTH cost several round trips (often seconds on
+    a remote server), so each connection is reused for up to `max_messages`
+    messages. A connection idle for more than `noop_interval` seconds is
+    checked with NOOP before use; one that fails is replaced, and a send that
+    fails on a dropped connection is retried once on a fresh one.
+    """
+
+    def __init__(self, host, port, username=None, password=None, starttls=True,
+                 size=2, max_messages=100, noop_interval=10, max_idle=240, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.max_messages = max_messages
+        self.noop_interval = noop_interval
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.connects = 0
+        self.reconnects = 0
+        self.noop_checks = 0
+        self.sent = 0
+        self.errors = 0
+
+    # ---- connections ----
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            _close(smtp)
+            raise
+        with self._lock:
+            self.connects += 1
+        return _Session(smtp)
+
+    def _healthy(self, session):
+        idle = time.monotonic() - session.last_used
+        if idle > self.max_idle:
+            return False  # servers drop idle clients; do not wait for the error
+        if idle < self.noop_interval:
+            return True
+        with self._lock:
+            self.noop_checks += 1
+        try:
+            return session.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self):
+        """Return a ready session (reused if possible, otherwise a new one)"""
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle, self._pid = [], os.getpid()  # sockets belong to the parent
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+            if self._healthy(session):
+                return session
+            _close(session.smtp)
+
+    def release(self, session, broken=False):
+        """Give a session back; broken or worn-out sessions are closed"""
+        session.last_used = time.monotonic()
+        if not broken and session.sent < self.max_messages:
+            with self._lock:
+                if len(self._idle) < self.size and self._pid == os.getpid():
+                    self._idle.append(session)
+                    return
+        _close(session.smtp)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            _close(session.smtp)
+
+    # ---- sending ----
+
+    def _send_on(self, session, message):
+        session.smtp.send_message(message)
+        session.sent += 1
+        with self._lock:
+            self.sent += 1
+
+    def send(self, message):
+        """Send one email.message.Message; raises on failure"""
+        error = self.send_many([message])[0]
+        if error is not None:
+            raise error
+
+    def send_many(self, messages):
+        """Send several messages over one connection.
+
+        Returns one entry per message: None if it was sent, otherwise the
+        exception. A connection that errors is replaced before the next
+        message; if no connection can be made, the remaining messages fail
+        at once instead of each waiting for the connect timeout.
+        """
+        results = []
+        session = None
+        broken = True  # an unexpected exception leaves the connection in an unknown state
+        try:
+            for index, message in enumerate(messages):
+                if session is not None and session.sent >= self.max_messages:
+                    self.release(session)
+                    session = None
+                error, unreachable = None, False
+                for attempt in range(2):
+                    if session is None:
+                        try:
+                            session = self.acquire()
+                        except (smtplib.SMTPException, OSError) as err:
+                            error, unreachable = err, True
+                            break
+                    try:
+                        self._send_on(session, message)
+                        error = None
+                        break
+                    except smtplib.SMTPServerDisconnected as err:
+                        # Dropped since the health check: retry once on a new connection
+                        _close(session.smtp)
+                        session, error = None, err
+                        if attempt == 0:
+                            with self._lock:
+                                self.reconnects += 1
+                    except (smtplib.SMTPException, OSError) as err:
+                        error = err
+                        # Recipient refusals leave the connection usable; anything else may not
+                        if not isinstance(err, (smtplib.SMTPRecipientsRefused,
+                                                smtplib.SMTPSenderRefused)):
+                            self.release(session, broken=True)
+                            session = None
+                        break
+                if unreachable:
+                    failed = len(messages) - index
+                    with self._lock:
+                        self.errors += failed
+                    results.extend([error] * failed)
+                    break
+                if error is not None:
+                    with self._lock:
+                        self.errors += 1
+                results.append(error)
+            broken = False
+        finally:
+            if session is not None:
+                self.release(session, broken=broken)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'connects': self.connects,
+                'reconnects': self.reconnects,
+                'noop_checks': self.noop_checks,
+                'sent': self.sent,
+                'errors': self.errors,
+            }
+
+def _close(smtp):
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            smtp.close()
+        except OSError:
+            pass
@@ -0,0 +1,136 @@
+# static_assets.py - Fingerprinted, Pre-Compressed Static Files
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # optional (pip install brotli)
+except ImportError:
+    brotli = None
+
+# url_for('static', filename=...) gets ?v=<content hash>, and a request
+# carrying the current hash is cached by browsers for a year without
+# revalidation: a changed file gets a new URL instead. Text assets are
+# pre-compressed next to the original (style.css.gz / style.css.br).
+
+IMMUTABLE_MAX_AGE = 31536000
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml')
+MIN_COMPRESS_SIZE = 256
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]  # preferred first
+
+_versions = {}  # path -> (mtime, size, hash)
+_lock = threading.Lock()
+_stats = {'immutable': 0, 'compressed': 0, 'plain': 0, 'built': 0}
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+def asset_version(path):
+    """Short hash of a file's content (None if it does not exist); recomputed when the file changes"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    cached = _versions.get(path)
+    if cached and cached[:2] == (info.st_mtime, info.st_size):
+        return cached[2]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:12]
+    _versions[path] = (info.st_mtime, info.st_size, version)
+    return version
+
+def _is_fresh(variant, path):
+    try:
+        return os.path.getmtime(variant) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+def build_compressed(folder):
+    """Write .gz (and .br when brotli is installed) next to every text asset that needs it"""
+    built = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(COMPRESSIBLE) or os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            compressors = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                compressors.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+            for suffix, compress in compressors:
+                variant = path + suffix
+                if _is_fresh(variant, path):
+                    continue
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                temp = f"{variant}.{os.getpid()}.tmp"
+                with open(temp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(temp, variant)  # never serve a half-written file
+                built += 1
+    _count('built', built)
+    return built
+
+def _pick_variant(path):
+    if not path.endswith(COMPRESSIBLE):
+        return None, None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and _is_fresh(path + suffix, path):
+            return encoding, path + suffix
+    return None, None
+
+def serve_static(filename):
+    """Replacement for Flask's static view: compressed variants and immutable caching"""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    immutable = request.args.get('v') == asset_version(path)
+    max_age = IMMUTABLE_MAX_AGE if immutable else current_app.get_send_file_max_age(filename)
+
+    encoding, variant = _pick_variant(path)
+    if encoding:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = send_file(variant, mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+        _count('compressed')
+    else:
+        response = send_file(path, max_age=max_age)
+        _count('plain')
+    if path.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+        _count('immutable')
+    return response
+
+def _add_version(endpoint, values):
+    if endpoint != 'static' or 'v' in values or 'filename' not in values:
+        return
+    path = safe_join(current_app.static_folder, values['filename'])
+    version = asset_version(path) if path else None
+    if version:
+        values['v'] = version
+
+def static_stats():
+    with _lock:
+        return dict(_stats, brotli=brotli is not None)
+
+def init_app(app):
+    """Fingerprint static URLs and serve pre-compressed variants"""
+    app.url_defaults(_add_version)
+    app.view_functions['static'] = serve_static
+    if app.static_folder and os.path.isdir(app.static_folder):
+        try:
+            build_compressed(app.static_folder)
+        except OSError as err:
+            print(f"Static Assets Error: {err}")